@@ -1,4 +1,5 @@
 import os
+import logging
 from dotenv import load_dotenv
 from flask import Flask, jsonify
 from flask_cors import CORS
@@ -6,22 +7,30 @@ from flask_cors import CORS
 # Load environment variables FIRST
 load_dotenv()
 
+# Configure logging once for the whole backend (set LOG_LEVEL=DEBUG for per-request traces)
+logging.basicConfig(
+    level=os.environ.get('LOG_LEVEL', 'INFO').upper(),
+    format='%(asctime)s %(levelname)s %(name)s: %(message)s'
+)
+logger = logging.getLogger(__name__)
+
 # --- CRITICAL: IMPORT AND INITIALIZE MODELS BEFORE BLUEPRINTS ---
+from utils import load_models
 from utils.load_models import init_models
 
 # Initialize models IMMEDIATELY
-print("\n" + "="*80)
-print("INITIALIZING APPLICATION")
-print("="*80)
+logger.info("Initializing application")
 init_models()
-print("="*80 + "\n")
 
 # NOW import blueprints (they will see loaded models)
 from routes.calibration_routes import calibration_bp
 from routes.exam_routes import exam_bp
 
+from utils.json_provider import OrjsonProvider
+
 # --- Flask App Setup ---
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 CORS(app, supports_credentials=True, origins=["http://localhost:8080"])
 
 # Basic configuration
@@ -36,10 +45,9 @@ app.register_blueprint(exam_bp, url_prefix='/api/exam')
 @app.route('/')
 def health_check():
     """Simple health check endpoint."""
-    from utils.load_models import mouse_model, keystroke_model
     models_status = {
-        "keystroke_model_loaded": keystroke_model is not None,
-        "mouse_model_loaded": mouse_model is not None
+        "keystroke_model_loaded": load_models.keystroke_model is not None,
+        "mouse_model_loaded": load_models.mouse_model is not None
     }
     return jsonify({
         "status": "Proctoring Backend Running",
@@ -56,5 +64,5 @@ if __name__ == '__main__':
         return response, 500
     
     debug_mode = app.config['ENV'] == 'development'
-    print("Server running in development mode." if debug_mode else "Server running in production mode.")
+    logger.info("Server running in %s mode.", "development" if debug_mode else "production")
     app.run(debug=debug_mode)
\ No newline at end of file
@@ -0,0 +1,79 @@
+"""
+Export the keystroke pipeline (scaler + XGBoost) as an ONNX graph (models/keystroke.onnx).
+Run this in backend directory: python export_onnx.py
+
+Needs skl2onnx, onnxmltools and onnxruntime (not in requirements.txt; only
+this script and servers that should use the graph need them). init_models
+serves keystroke.onnx with ONNX Runtime when it exists; delete it to go
+back to the booster or pickled pipeline.
+"""
+
+import joblib
+import numpy as np
+import os
+import sys
+
+from utils.load_models import _MODEL_PATHS
+
+
+def export_onnx():
+    """Convert xgboost_pipeline.joblib to keystroke.onnx and check it matches"""
+    
+    import onnxruntime as ort
+    from onnxmltools.convert.xgboost.operator_converters.XGBoost import convert_xgboost
+    from skl2onnx import convert_sklearn, update_registered_converter
+    from skl2onnx.common.data_types import FloatTensorType
+    from skl2onnx.common.shape_calculator import calculate_linear_classifier_output_shapes
+    from xgboost import XGBClassifier
+    
+    models_dir = 'models'
+    pipeline_path = os.path.join(models_dir, _MODEL_PATHS['keystroke'])
+    
+    if not os.path.exists(pipeline_path):
+        print(f"❌ {pipeline_path} not found!")
+        print("   Run this from your backend directory")
+        sys.exit(1)
+    
+    pipeline = joblib.load(pipeline_path)
+    n_features = pipeline.n_features_in_
+    print(f"✓ Loaded keystroke pipeline ({n_features} features)")
+    
+    # skl2onnx has no XGBoost converter of its own; borrow onnxmltools'
+    update_registered_converter(
+        XGBClassifier, 'XGBoostXGBClassifier',
+        calculate_linear_classifier_output_shapes, convert_xgboost,
+        options={'nocl': [True, False], 'zipmap': [True, False, 'columns']},
+    )
+    onnx_model = convert_sklearn(
+        pipeline, 'keystroke',
+        [('X', FloatTensorType([None, n_features]))],
+        target_opset={'': 15, 'ai.onnx.ml': 3},
+        # Plain (n, 2) probability tensor instead of a list of dicts
+        options={XGBClassifier: {'zipmap': False}},
+    )
+    
+    onnx_path = os.path.join(models_dir, 'keystroke.onnx')
+    with open(onnx_path, 'wb') as f:
+        f.write(onnx_model.SerializeToString())
+    print(f"✓ Saved ONNX graph to {onnx_path}")
+    
+    # Compare against the pipeline on rows spread around the training data
+    scaler = list(pipeline.named_steps.values())[0]
+    rng = np.random.default_rng(0)
+    X = rng.normal(scaler.mean_, scaler.scale_, size=(256, n_features)).astype(np.float32)
+    session = ort.InferenceSession(onnx_path, providers=['CPUExecutionProvider'])
+    onnx_proba = session.run([session.get_outputs()[1].name], {session.get_inputs()[0].name: X})[0]
+    max_diff = float(np.max(np.abs(onnx_proba[:, 1] - pipeline.predict_proba(X)[:, 1])))
+    print(f"✓ Max |ONNX - pipeline| probability difference: {max_diff:.2e}")
+    if max_diff > 1e-4:
+        print("⚠️  Difference is larger than expected; check the graph before deploying it")
+
+
+if __name__ == "__main__":
+    try:
+        export_onnx()
+    except Exception as e:
+        print(f"\n❌ ERROR: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,50 @@
+"""
+Export the mouse SVM as plain decision weights (models/svm_linear.npz).
+Run this in backend directory: python export_weights.py
+
+The mouse model is a StandardScaler + linear SVC pipeline; the scaler is
+folded into the SVM so that decision = X @ w + b on raw features. The
+backend scores with these weights, and loading them from .npz skips
+reconstructing them from the pickled pipeline.
+"""
+
+import joblib
+import os
+import sys
+
+import numpy as np
+
+from utils.load_models import _MODEL_PATHS, _fold_linear_pipeline
+
+
+def export_weights():
+    """Fold the mouse pipeline and save its weights"""
+    
+    models_dir = 'models'
+    mouse_model_path = os.path.join(models_dir, _MODEL_PATHS['mouse'])
+    
+    if not os.path.exists(mouse_model_path):
+        print(f"❌ {mouse_model_path} not found!")
+        print("   Run this from your backend directory")
+        sys.exit(1)
+    
+    mouse_model = joblib.load(mouse_model_path)
+    folded = _fold_linear_pipeline(mouse_model)
+    if folded is None:
+        print("❌ Mouse model is not a scaler + linear-kernel SVM pipeline; nothing to export")
+        sys.exit(1)
+    
+    w, b = folded
+    out_path = os.path.join(models_dir, 'svm_linear.npz')
+    np.savez(out_path, w=w, b=np.asarray(b))
+    print(f"✓ Saved {len(w)} weights + bias to {out_path}")
+
+
+if __name__ == "__main__":
+    try:
+        export_weights()
+    except Exception as e:
+        print(f"\n❌ ERROR: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -4,9 +4,17 @@ Run this in backend directory: python extract_scalers.py
 """
 
 import joblib
+import numpy as np
 import os
 import sys
 
+def save_scaler_arrays(scaler, path):
+    """Save the scaler's mean_/scale_ as plain arrays (read by init_models without unpickling)"""
+    np.savez(path, mean=np.asarray(scaler.mean_, dtype=np.float64),
+             scale=np.asarray(scaler.scale_, dtype=np.float64))
+    print(f"    ✓ Saved arrays to: {path}")
+
+
 def extract_scalers():
     """Extract scalers from model files"""
     
@@ -63,6 +71,7 @@ def extract_scalers():
                 scaler_path = os.path.join(models_dir, 'keystroke_scaler.joblib')
                 joblib.dump(step, scaler_path)
                 print(f"\n    ✓ Saved to: {scaler_path}")
+                save_scaler_arrays(step, os.path.join(models_dir, 'keystroke_scaler.npz'))
                 scaler_found = True
                 break
         
@@ -121,6 +130,7 @@ def extract_scalers():
                 scaler_path = os.path.join(models_dir, 'mouse_scaler.joblib')
                 joblib.dump(step, scaler_path)
                 print(f"\n    ✓ Saved to: {scaler_path}")
+                save_scaler_arrays(step, os.path.join(models_dir, 'mouse_scaler.npz'))
                 scaler_found = True
                 break
         
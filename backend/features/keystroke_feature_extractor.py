@@ -9,6 +9,35 @@ def stable_z_score(measurement, mean, std, epsilon=1e-6):
     """
     return (measurement - mean) / (std + epsilon)
 
+
+def _mean_std(values):
+    """
+    Population mean and std of a latency list, or (0.0, 0.0) when it is
+    empty. Converts to an array once and computes the mean once, where
+    separate np.mean/np.std calls would do both twice.
+    """
+    arr = np.asarray(values, dtype=np.float64)
+    if arr.size == 0:
+        return 0.0, 0.0
+    mean = arr.mean()
+    dev = arr - mean
+    return float(mean), float(np.sqrt(np.dot(dev, dev) / arr.size))
+
+# Ordered feature names (snake_case, matching the database columns)
+KEYSTROKE_FEATURE_NAMES = (
+    'mean_du_key1_key1',
+    'mean_dd_key1_key2',
+    'mean_du_key1_key2',
+    'mean_ud_key1_key2',
+    'mean_uu_key1_key2',
+    'std_du_key1_key1',
+    'std_dd_key1_key2',
+    'std_du_key1_key2',
+    'std_ud_key1_key2',
+    'std_uu_key1_key2',
+    'keystroke_count'
+)
+
 class KeystrokeFeatureExtractor:
     """
     Extracts dwell times and flight times for keystroke dynamics based on the provided logic.
@@ -16,19 +45,7 @@ class KeystrokeFeatureExtractor:
     """
     def __init__(self):
         # Feature names must be snake_case to match the database columns
-        self.feature_names = [
-            'mean_du_key1_key1', 
-            'mean_dd_key1_key2', 
-            'mean_du_key1_key2', 
-            'mean_ud_key1_key2', 
-            'mean_uu_key1_key2', 
-            'std_du_key1_key1', 
-            'std_dd_key1_key2', 
-            'std_du_key1_key2', 
-            'std_ud_key1_key2', 
-            'std_uu_key1_key2', 
-            'keystroke_count'
-        ]
+        self.feature_names = list(KEYSTROKE_FEATURE_NAMES)
         
         # Mapping from the calculation keys to the standardized feature names
         self._name_map = {
@@ -60,43 +77,41 @@ class KeystrokeFeatureExtractor:
         presses = df[df['type'] == 'keydown'].reset_index(drop=True)
         releases = df[df['type'] == 'keyup'].reset_index(drop=True)
         
+        press_ts = presses['timestamp'].to_numpy(dtype=np.float64)
+        release_ts = releases['timestamp'].to_numpy(dtype=np.float64)
+
         # --- 1. Hold Time (DU.key1.key1) ---
-        hold_times = []
-        min_len = min(len(presses), len(releases))
-        if min_len > 0:
-            hold_times = (releases['timestamp'][:min_len] - presses['timestamp'][:min_len])
+        min_len = min(len(press_ts), len(release_ts))
+        hold_times = release_ts[:min_len] - press_ts[:min_len]
 
         # --- 2. Digraph Latencies (key1.key2) ---
-        dd_list = []
-        ud_list = []
-        uu_list = []
-        du_list = []
-
-        for i in range(len(presses) - 1):
-            p1 = presses.iloc[i]['timestamp']
-            p2 = presses.iloc[i+1]['timestamp']
-            
-            if i < len(releases) - 1:
-                r1 = releases.iloc[i]['timestamp']
-                r2 = releases.iloc[i+1]['timestamp']
-                
-                dd_list.append(p2 - p1)
-                ud_list.append(p2 - r1)
-                uu_list.append(r2 - r1)
-                du_list.append(r2 - p1)
+        # Consecutive press/release pairs, as slices of the two timestamp
+        # arrays rather than per-row .iloc lookups appended to lists
+        n = max(min_len - 1, 0)
+        p1, p2 = press_ts[:n], press_ts[1:n + 1]
+        r1, r2 = release_ts[:n], release_ts[1:n + 1]
+        dd = p2 - p1
+        ud = p2 - r1
+        uu = r2 - r1
+        du = r2 - p1
 
         # --- 3. CONSTRUCT FEATURES ---
+        mean_hold, std_hold = _mean_std(hold_times)
+        mean_dd, std_dd = _mean_std(dd)
+        mean_du, std_du = _mean_std(du)
+        mean_ud, std_ud = _mean_std(ud)
+        mean_uu, std_uu = _mean_std(uu)
         raw_calculated_features = {
-            'mean_DU.key1.key1': np.mean(hold_times) if len(hold_times) > 0 else 0.0,
-            'std_DU.key1.key1': np.std(hold_times) if len(hold_times) > 0 else 0.0,
-            'mean_DD.key1.key2': np.mean(dd_list) if len(dd_list) > 0 else 0.0,
-            'mean_DU.key1.key2': np.mean(du_list) if len(du_list) > 0 else 0.0,
-            'mean_UD.key1.key2': np.mean(ud_list) if len(ud_list) > 0 else 0.0,
-            'mean_UU.key1.key2': np.mean(uu_list) if len(uu_list) > 0 else 0.0,
-            'std_DD.key1.key2': np.std(dd_list) if len(dd_list) > 0 else 0.0,
-            'std_DU.key1.key2': np.std(du_list) if len(du_list) > 0 else 0.0,
-            'std_UD.key1.key2': np.std(ud_list) if len(ud_list) > 0 else 0.0,
-            'std_UU.key1.key2': np.std(uu_list) if len(uu_list) > 0 else 0.0,
+            'mean_DU.key1.key1': mean_hold,
+            'std_DU.key1.key1': std_hold,
+            'mean_DD.key1.key2': mean_dd,
+            'mean_DU.key1.key2': mean_du,
+            'mean_UD.key1.key2': mean_ud,
+            'mean_UU.key1.key2': mean_uu,
+            'std_DD.key1.key2': std_dd,
+            'std_DU.key1.key2': std_du,
+            'std_UD.key1.key2': std_ud,
+            'std_UU.key1.key2': std_uu,
             'keystroke_count': len(presses)
         }
 
@@ -147,6 +162,25 @@ class KeystrokeFeatureExtractor:
             normalized_features.append(normalized_value)
         return normalized_features, None
 
+    def extract_feature_array(self, events: List[Dict], out: Union[np.ndarray, None] = None) -> np.ndarray:
+        """
+        Exam-path variant of extract_features: returns the raw features as a
+        float32 array in KEYSTROKE_FEATURE_NAMES order, ready for the model.
+        If out is given the features are written into it and it is returned.
+        """
+        if out is None:
+            feature_array = np.zeros(len(KEYSTROKE_FEATURE_NAMES), dtype=np.float32)
+        else:
+            feature_array = out
+            feature_array.fill(0.0)
+        if not events or len(events) < 2:
+            return feature_array
+
+        raw_features = self._calculate_features(events)
+        for i, name in enumerate(KEYSTROKE_FEATURE_NAMES):
+            feature_array[i] = raw_features[name]
+        return feature_array
+
     def extract_features_all(self, all_events: List[Dict]) -> Tuple[List[List[float]], Dict]:
         """
         NEW METHOD: Processes all calibration events and returns multiple feature vectors.
@@ -5,10 +5,21 @@ def stable_z_score(measurement, mean, std, epsilon=1e-6):
     """
     return (measurement - mean) / (std + epsilon)
 
+import logging
 import numpy as np
-import pandas as pd
+from collections import Counter
 from typing import List, Dict, Union, Tuple
 
+logger = logging.getLogger(__name__)
+
+# Ordered feature names (consistent with the database and ML model)
+MOUSE_FEATURE_NAMES = (
+    'inactive_duration',
+    'copy_cut',
+    'paste',
+    'double_click'
+)
+
 class MouseFeatureExtractor:
     """
     Extracts features related to mouse activity.
@@ -16,44 +27,49 @@ class MouseFeatureExtractor:
     """
     def __init__(self):
         # Feature names must be consistent with the database and ML model
-        self.feature_names = [
-            'inactive_duration', 
-            'copy_cut', 
-            'paste', 
-            'double_click'
-        ]
+        self.feature_names = list(MOUSE_FEATURE_NAMES)
+
+    @staticmethod
+    def _event_time(event: Dict) -> float:
+        """Event time as a float, NaN (with a warning) when the event has none."""
+        t = event.get('timestamp', event.get('t'))
+        if t is None:
+            if 'timestamp' not in event:
+                logger.warning("Mouse event missing timestamp: %s", event)
+            return np.nan
+        return float(t)
 
     def _calculate_features(self, raw_events: List[Dict]) -> Dict[str, float]:
         """
         Calculates raw features from a list of mouse events (Your provided logic).
         Accepts both 'timestamp' and 't' as valid time fields.
         """
-        import logging
         if not raw_events:
             return {name: 0.0 for name in self.feature_names}
 
-        # Normalize time field
-        for event in raw_events:
-            if 'timestamp' not in event and 't' in event:
-                event['timestamp'] = event['t']
-            if 'timestamp' not in event:
-                logging.warning(f"Mouse event missing timestamp: {event}")
-
-        df = pd.DataFrame(raw_events)
+        # Timestamps in one pass ('t' is accepted when 'timestamp' is absent)
+        timestamps = np.fromiter(
+            (self._event_time(event) for event in raw_events), dtype=np.float64, count=len(raw_events)
+        )
 
-        # Calculate Duration per event (Time since previous event)
-        df['timestamp'] = df['timestamp'].astype(float)
-        df['prev_timestamp'] = df['timestamp'].shift(1)
-        df['duration'] = df['timestamp'] - df['prev_timestamp']
-        df['duration'] = df['duration'].fillna(0)
+        # Duration per event (time since previous event, 0 for the first)
+        durations = np.empty_like(timestamps)
+        durations[0] = 0.0
+        np.subtract(timestamps[1:], timestamps[:-1], out=durations[1:])
 
-        # 1. Inactive Duration
-        inactive_sum = df[df.get('tab', 'active') != 'active']['duration'].sum() if 'tab' in df else 0.0
+        # 1. Inactive Duration (events missing 'tab' count as inactive once any event has one)
+        inactive_sum = 0.0
+        if any('tab' in event for event in raw_events):
+            inactive = np.fromiter(
+                (event.get('tab') != 'active' for event in raw_events), dtype=bool, count=len(raw_events)
+            )
+            inactive_sum = np.nansum(durations[inactive])
 
         # 2. Event Counters
-        copy_cut_sum = len(df[df.get('event_type', '') .isin(['copy', 'cut'])]) if 'event_type' in df else 0
-        paste_sum = len(df[df.get('event_type', '') == 'paste']) if 'event_type' in df else 0
-        double_click_sum = len(df[df.get('event_type', '') == 'dblclick']) if 'event_type' in df else 0
+        event_types = Counter(event.get('event_type') for event in raw_events)
+        copy_cut_sum = event_types['copy'] + event_types['cut']
+        paste_sum = event_types['paste']
+        double_click_sum = event_types['dblclick']
 
         raw_features = {
             "inactive_duration": float(inactive_sum),
@@ -92,4 +108,16 @@ class MouseFeatureExtractor:
             std = stats['std']
             normalized_value = stable_z_score(value, mean, std)
             normalized_features.append(normalized_value)
-        return normalized_features, None
\ No newline at end of file
+        return normalized_features, None
+
+    def extract_feature_array(self, events: List[Dict], out: Union[np.ndarray, None] = None) -> np.ndarray:
+        """
+        Exam-path variant of extract_features: returns the raw features as a
+        float32 array in MOUSE_FEATURE_NAMES order, ready for the model.
+        If out is given the features are written into it and it is returned.
+        """
+        raw_features = self._calculate_features(events)
+        feature_array = np.empty(len(MOUSE_FEATURE_NAMES), dtype=np.float32) if out is None else out
+        for i, name in enumerate(MOUSE_FEATURE_NAMES):
+            feature_array[i] = raw_features[name]
+        return feature_array
@@ -0,0 +1,38 @@
+# backend/gunicorn.conf.py
+# Gunicorn configuration for the proctoring backend.
+import multiprocessing
+import os
+
+bind = "0.0.0.0:5000"
+# Override per host with GUNICORN_WORKERS / GUNICORN_THREADS
+workers = int(os.environ.get("GUNICORN_WORKERS", 4))
+
+# Threaded workers: a request waiting on the model batcher, the incident
+# writer or Supabase releases the GIL, so other requests in the same worker
+# keep running. All shared state (caches, session history, batchers) is
+# lock-protected for this.
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", multiprocessing.cpu_count()))
+
+# Import app.py (and therefore run init_models) once in the master process.
+# Workers are forked afterwards and share the read-only model pages
+# copy-on-write instead of each unpickling their own copy.
+preload_app = True
+
+
+def post_fork(server, worker):
+    """
+    Runs in each worker right after fork. Models are not reloaded here: they
+    came across the fork with the preloaded app. Only per-process state is
+    reset: RNGs would otherwise produce the same sequence in every worker,
+    and the models are warmed again because BLAS/OpenMP thread pools do not
+    survive fork. (Batcher/writer threads restart lazily per pid on first use.)
+    """
+    import random
+    import numpy as np
+    from utils.load_models import warm_up_models
+
+    random.seed()
+    np.random.seed()
+    warm_up_models()
+    server.log.info("Worker %s forked with preloaded models", worker.pid)
@@ -0,0 +1,61 @@
+"""
+Export the keystroke XGBoost model as a native booster (models/keystroke.ubj).
+Run this in backend directory: python migrate_xgb.py
+
+init_models loads keystroke.ubj with xgboost's own loader (plus the
+keystroke scaler) instead of unpickling the whole sklearn pipeline.
+Delete models/keystroke.ubj to go back to xgboost_pipeline.joblib.
+"""
+
+import joblib
+import os
+import sys
+
+from utils.load_models import _MODEL_PATHS
+
+
+def migrate_xgb():
+    """Split xgboost_pipeline.joblib into keystroke.ubj + keystroke_scaler.joblib"""
+    
+    models_dir = 'models'
+    pipeline_path = os.path.join(models_dir, _MODEL_PATHS['keystroke'])
+    
+    if not os.path.exists(pipeline_path):
+        print(f"❌ {pipeline_path} not found!")
+        print("   Run this from your backend directory")
+        sys.exit(1)
+    
+    pipeline = joblib.load(pipeline_path)
+    if not hasattr(pipeline, 'named_steps'):
+        print("❌ Keystroke model is not a Pipeline; nothing to migrate")
+        sys.exit(1)
+    
+    steps = list(pipeline.named_steps.values())
+    scaler, classifier = steps[0], steps[-1]
+    if len(steps) != 2 or not hasattr(scaler, 'mean_') or not hasattr(classifier, 'get_booster'):
+        print(f"❌ Expected a scaler + XGBClassifier pipeline, got: {list(pipeline.named_steps.keys())}")
+        sys.exit(1)
+    
+    booster = classifier.get_booster()
+    objective = classifier.get_params().get('objective')
+    if objective != 'binary:logistic':
+        print(f"❌ Unsupported objective {objective!r}; BoosterPipeline expects binary:logistic")
+        sys.exit(1)
+    
+    booster_path = os.path.join(models_dir, 'keystroke.ubj')
+    booster.save_model(booster_path)
+    print(f"✓ Saved booster to {booster_path}")
+    
+    scaler_path = os.path.join(models_dir, _MODEL_PATHS['keystroke_scaler'])
+    joblib.dump(scaler, scaler_path, compress=0)
+    print(f"✓ Saved scaler to {scaler_path}")
+
+
+if __name__ == "__main__":
+    try:
+        migrate_xgb()
+    except Exception as e:
+        print(f"\n❌ ERROR: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -1,14 +1,17 @@
-import joblib
 from flask import Blueprint, request, jsonify
-from utils.db_helpers import save_personalized_thresholds, get_student_baseline
-from utils.load_models import mouse_model, keystroke_model
-from features.keystroke_feature_extractor import KeystrokeFeatureExtractor
-from features.mouse_feature_extractor import MouseFeatureExtractor
+from utils.db_helpers import save_personalized_thresholds
+from utils import load_models
+from features.keystroke_feature_extractor import KeystrokeFeatureExtractor, KEYSTROKE_FEATURE_NAMES
+from features.mouse_feature_extractor import MouseFeatureExtractor, MOUSE_FEATURE_NAMES
+from routes.exam_routes import MIN_KEY_EVENTS, MIN_MOUSE_EVENTS
+import logging
+import warnings
 import numpy as np
-import pandas as pd
+from scipy.special import expit
 
 # Initialize the Blueprint
 calibration_bp = Blueprint('calibrate', __name__)
+logger = logging.getLogger(__name__)
 
 # Initialize extractors
 KEYSTROKE_FE = KeystrokeFeatureExtractor()
@@ -17,37 +20,41 @@ MOUSE_FE = MouseFeatureExtractor()
 # Statistical Constants
 EPSILON = 1e-6
 
-# Feature Lists
-KEYSTROKE_FEATURES = [
-    'mean_du_key1_key1', 'mean_dd_key1_key2', 'mean_du_key1_key2', 
-    'mean_ud_key1_key2', 'mean_uu_key1_key2', 'std_du_key1_key1', 
-    'std_dd_key1_key2', 'std_du_key1_key2', 'std_ud_key1_key2', 
-    'std_uu_key1_key2', 'keystroke_count'
-]
+# Feature Lists (shared with the extractors and the exam route)
+KEYSTROKE_FEATURES = list(KEYSTROKE_FEATURE_NAMES)
+MOUSE_FEATURES = list(MOUSE_FEATURE_NAMES)
+
+def _model_row(values):
+    """
+    One float32 model input row. The models take plain ndarrays in feature
+    order, as on the exam path; building a DataFrame per call only re-validates
+    the column names.
+    """
+    return np.asarray(values, dtype=np.float32).reshape(1, -1)
 
-MOUSE_FEATURES = [
-    'inactive_duration', 'copy_cut', 'paste', 'double_click'
-]
 
-def check_model_expects_normalization(model, sample_raw, sample_norm, feature_names):
+def check_model_expects_normalization(model, sample_raw, sample_norm):
     """
     Determines if a model was trained on normalized or raw features
     by testing both and seeing which gives more reasonable predictions.
     """
     try:
-        input_raw = pd.DataFrame([sample_raw], columns=feature_names)
-        input_norm = pd.DataFrame([sample_norm], columns=feature_names)
+        input_raw = _model_row(sample_raw)
+        input_norm = _model_row(sample_norm)
         
-        # Test raw features
-        if hasattr(model, 'predict_proba'):
-            proba_raw = model.predict_proba(input_raw)[0, 1]
-            proba_norm = model.predict_proba(input_norm)[0, 1]
-        else:
-            # SVM with decision_function
-            dec_raw = model.decision_function(input_raw)[0]
-            dec_norm = model.decision_function(input_norm)[0]
-            proba_raw = 1.0 / (1.0 + np.exp(-dec_raw))
-            proba_norm = 1.0 / (1.0 + np.exp(-dec_norm))
+        # Test raw features (plain ndarray rows; a model fitted on a
+        # DataFrame would warn about the missing feature names)
+        with warnings.catch_warnings():
+            warnings.filterwarnings("ignore", message="X does not have valid feature names")
+            if hasattr(model, 'predict_proba'):
+                proba_raw = model.predict_proba(input_raw)[0, 1]
+                proba_norm = model.predict_proba(input_norm)[0, 1]
+            else:
+                # SVM with decision_function
+                dec_raw = model.decision_function(input_raw)[0]
+                dec_norm = model.decision_function(input_norm)[0]
+                proba_raw = float(expit(dec_raw))
+                proba_norm = float(expit(dec_norm))
         
         # If normalized features give reasonable results and raw doesn't
         if 0.01 < proba_norm < 0.99 and (proba_raw == 0.0 or proba_raw == 1.0):
@@ -60,7 +67,7 @@ def check_model_expects_normalization(model, sample_raw, sample_norm, feature_na
             return False, "uncertain"
             
     except Exception as e:
-        print(f"[WARNING] Model type detection failed: {e}")
+        logger.warning("[CALIBRATION] Model type detection failed: %s", e)
         return False, "error"
 
 
@@ -69,7 +76,7 @@ def save_baseline():
     """
     Receives calibration data, calculates baseline statistics and personalized threshold.
     """
-    data = request.get_json()
+    data = request.get_json(cache=False)
     student_id = data.get('student_id')
     calibration_session_id = data.get('calibration_session_id')
     course_name = data.get('course_name', 'General')
@@ -79,147 +86,101 @@ def save_baseline():
     if not student_id or not calibration_session_id:
         return jsonify({"error": "Missing required fields"}), 400
 
-    print(f"\n{'='*80}")
-    print(f"[CALIBRATION] Starting baseline calculation for student: {student_id}")
-    print(f"[CALIBRATION] Session ID: {calibration_session_id}")
-    print(f"[CALIBRATION] Keystroke events: {len(keystroke_events)}, Mouse events: {len(mouse_events)}")
-    print(f"{'='*80}\n")
+    logger.info("[CALIBRATION] Starting baseline calculation for student %s, session %s", student_id, calibration_session_id)
+    logger.debug("[CALIBRATION] Keystroke events: %d, Mouse events: %d", len(keystroke_events), len(mouse_events))
+
+    # Feature arrays are always full width, so check the events behind them:
+    # an empty window would otherwise be scored as an all-zero row
+    if len(keystroke_events) < MIN_KEY_EVENTS or not mouse_events:
+        return jsonify({"error": "Insufficient calibration data"}), 400
+    if len(mouse_events) < MIN_MOUSE_EVENTS:
+        logger.debug("[CALIBRATION] Low mouse events: %d (recommended: %d+)", len(mouse_events), MIN_MOUSE_EVENTS)
 
     try:
         # === STEP 1: Extract RAW Features ===
-        print("[STEP 1] Extracting RAW features from calibration events...")
-        
-        k_features_raw, _ = KEYSTROKE_FE.extract_features(keystroke_events, baseline_stats=None)
-        m_features_raw, _ = MOUSE_FE.extract_features(mouse_events, baseline_stats=None)
+        # Written straight into one float64 array per modality; the list
+        # vectors and summary stats of extract_features are not needed here
+        k_raw = KEYSTROKE_FE.extract_feature_array(
+            keystroke_events, out=np.empty(len(KEYSTROKE_FEATURES), dtype=np.float64))
+        m_raw = MOUSE_FE.extract_feature_array(
+            mouse_events, out=np.empty(len(MOUSE_FEATURES), dtype=np.float64))
 
-        if not k_features_raw or not m_features_raw:
-            return jsonify({"error": "Insufficient calibration data"}), 400
-
-        print(f"[FEATURES] ✓ Extracted {len(k_features_raw)} keystroke features")
-        print(f"[FEATURES] ✓ Extracted {len(m_features_raw)} mouse features")
-        print(f"[FEATURES] Keystroke raw: {[f'{v:.2f}' for v in k_features_raw[:5]]}")
-        print(f"[FEATURES] Mouse raw: {[f'{v:.2f}' for v in m_features_raw]}")
+        logger.debug("[FEATURES] Keystroke raw: %s", k_raw)
+        logger.debug("[FEATURES] Mouse raw: %s", m_raw)
 
         # === STEP 2: Detect Model Input Format ===
-        print("\n[STEP 2] Detecting model input format...")
-        
-        # Create normalized versions for testing
-        k_mean = np.mean(k_features_raw)
-        k_std = max(np.std(k_features_raw), EPSILON)
-        k_features_norm = [(x - k_mean) / k_std for x in k_features_raw]
-        
-        m_mean = np.mean(m_features_raw)
-        m_std = max(np.std(m_features_raw), EPSILON)
-        m_features_norm = [(x - m_mean) / m_std for x in m_features_raw]
+        # Create normalized versions for testing (one array op per modality)
+        k_features_norm = (k_raw - k_raw.mean()) / max(k_raw.std(), EPSILON)
+        m_features_norm = (m_raw - m_raw.mean()) / max(m_raw.std(), EPSILON)
         
         k_needs_norm, k_format = check_model_expects_normalization(
-            keystroke_model, k_features_raw, k_features_norm, KEYSTROKE_FEATURES
+            load_models.keystroke_model, k_raw, k_features_norm
         )
         m_needs_norm, m_format = check_model_expects_normalization(
-            mouse_model, m_features_raw, m_features_norm, MOUSE_FEATURES
+            load_models.mouse_model, m_raw, m_features_norm
         )
         
-        print(f"[DETECTION] Keystroke model expects: {k_format} features")
-        print(f"[DETECTION] Mouse model expects: {m_format} features")
+        logger.debug("[DETECTION] Keystroke model expects: %s features, Mouse model expects: %s features",
+                     k_format, m_format)
 
         # === STEP 3: Prepare Features for Models ===
-        print("\n[STEP 3] Preparing features for model prediction...")
-        
         # Use the appropriate format based on detection
-        k_features_for_model = k_features_norm if k_needs_norm else k_features_raw
-        m_features_for_model = m_features_norm if m_needs_norm else m_features_raw
-        
-        print(f"[PREP] Using {'normalized' if k_needs_norm else 'raw'} keystroke features")
-        print(f"[PREP] Using {'normalized' if m_needs_norm else 'raw'} mouse features")
+        k_features_for_model = k_features_norm if k_needs_norm else k_raw
+        m_features_for_model = m_features_norm if m_needs_norm else m_raw
 
         # === STEP 4: Store Baseline Statistics ===
-        print("\n[STEP 4] Storing baseline statistics...")
-        
         # Always store RAW feature values as baseline
-        k_baseline_stats = {}
-        for i, feat_name in enumerate(KEYSTROKE_FEATURES):
-            k_baseline_stats[feat_name] = {
-                'mean': float(k_features_raw[i]),
-                'std': 1.0
-            }
-
-        m_baseline_stats = {}
-        for i, feat_name in enumerate(MOUSE_FEATURES):
-            m_baseline_stats[feat_name] = {
-                'mean': float(m_features_raw[i]),
-                'std': 1.0
-            }
-
-        print(f"[BASELINE] ✓ Stored baseline for {len(k_baseline_stats)} keystroke features")
-        print(f"[BASELINE] ✓ Stored baseline for {len(m_baseline_stats)} mouse features")
+        k_baseline_stats = {feat_name: {'mean': mean, 'std': 1.0}
+                            for feat_name, mean in zip(KEYSTROKE_FEATURES, k_raw.tolist())}
+        m_baseline_stats = {feat_name: {'mean': mean, 'std': 1.0}
+                            for feat_name, mean in zip(MOUSE_FEATURES, m_raw.tolist())}
 
         # === STEP 5: Calculate Baseline Anomaly Scores ===
-        print("\n[STEP 5] Calculating baseline anomaly scores...")
-        
         k_baseline_score = 0.0
         m_baseline_score = 0.0
         
         try:
-            if keystroke_model is None or mouse_model is None:
+            if load_models.keystroke_model is None or load_models.mouse_model is None:
                 raise Exception("Models not loaded")
             
-            k_input = pd.DataFrame([k_features_for_model], columns=KEYSTROKE_FEATURES)
-            m_input = pd.DataFrame([m_features_for_model], columns=MOUSE_FEATURES)
-            
-            print(f"[MODELS] Keystroke input (first 5): {k_input.iloc[0, :5].tolist()}")
-            print(f"[MODELS] Mouse input: {m_input.iloc[0].tolist()}")
-            
-            # Keystroke model
-            k_proba = keystroke_model.predict_proba(k_input)
-            k_baseline_score = float(k_proba[0, 1])
-            print(f"[MODELS] ✓ Keystroke baseline score: {k_baseline_score:.6f}")
+            k_input = _model_row(k_features_for_model)
+            m_input = _model_row(m_features_for_model)
             
-            # Mouse model
-            try:
-                m_decision = mouse_model.decision_function(m_input)
-                m_baseline_score = float(1.0 / (1.0 + np.exp(-m_decision[0])))
-                print(f"[MODELS] ✓ Mouse baseline score (sigmoid): {m_baseline_score:.6f}")
-            except AttributeError:
-                m_proba = mouse_model.predict_proba(m_input)
-                m_baseline_score = float(m_proba[0, 1])
-                print(f"[MODELS] ✓ Mouse baseline score (proba): {m_baseline_score:.6f}")
+            # Same scoring functions as the exam path: the keystroke scaler
+            # is applied inline from its cached mean and 1/scale, and the
+            # mouse SVM is a dot product (sigmoid of the decision)
+            k_baseline_score = float(load_models.keystroke_scores(k_input)[0])
+            m_baseline_score = float(load_models.mouse_scores(m_input)[0])
+            logger.debug("[MODELS] Keystroke baseline score: %.6f, Mouse baseline score: %.6f",
+                         k_baseline_score, m_baseline_score)
 
             # Validation
             if k_baseline_score == 0.0 or k_baseline_score == 1.0:
-                print(f"[WARNING] ⚠️ Keystroke score is extreme: {k_baseline_score}")
-                print("[WARNING] This suggests model/feature mismatch!")
+                logger.warning("[CALIBRATION] Keystroke score is extreme (%s), suggesting a model/feature mismatch",
+                               k_baseline_score)
                 k_baseline_score = 0.05  # Fallback
             
             if m_baseline_score == 0.0 or m_baseline_score == 1.0:
-                print(f"[WARNING] ⚠️ Mouse score is extreme: {m_baseline_score}")
-                print("[WARNING] This suggests model/feature mismatch!")
+                logger.warning("[CALIBRATION] Mouse score is extreme (%s), suggesting a model/feature mismatch",
+                               m_baseline_score)
                 m_baseline_score = 0.05  # Fallback
 
-        except Exception as model_error:
-            print(f"\n[ERROR] ❌ Model prediction failed: {model_error}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            logger.exception("[CALIBRATION] Model prediction failed, using fallback baseline scores")
             k_baseline_score = 0.05
             m_baseline_score = 0.05
 
         # === STEP 6: Calculate Personalized Threshold ===
-        print("\n[STEP 6] Calculating personalized threshold...")
-        print(f"[THRESHOLD] Keystroke baseline: {k_baseline_score:.6f}")
-        print(f"[THRESHOLD] Mouse baseline: {m_baseline_score:.6f}")
-        
         # Threshold = baseline + significant buffer
         k_threshold = max(0.4, min(0.85, k_baseline_score + 0.35))
         m_threshold = max(0.4, min(0.85, m_baseline_score + 0.35))
         personalized_threshold = (0.5 * k_threshold) + (0.5 * m_threshold)
         personalized_threshold = max(0.55, min(0.85, personalized_threshold))
         
-        print(f"[THRESHOLD] Keystroke threshold: {k_threshold:.4f}")
-        print(f"[THRESHOLD] Mouse threshold: {m_threshold:.4f}")
-        print(f"[THRESHOLD] ✓ FINAL threshold: {personalized_threshold:.4f}")
+        logger.debug("[THRESHOLD] Keystroke: %.4f, Mouse: %.4f, Final: %.4f",
+                     k_threshold, m_threshold, personalized_threshold)
 
         # === STEP 7: Save to Database ===
-        print("\n[STEP 7] Saving baseline to database...")
-        
         # Store whether models need normalization
         baseline_package = {
             'keystroke': {
@@ -232,9 +193,9 @@ def save_baseline():
             }
         }
 
-        all_features = k_features_raw + m_features_raw
-        fusion_mean = float(np.mean(all_features))
-        fusion_std = max(float(np.std(all_features)), EPSILON)
+        all_features = np.concatenate((k_raw, m_raw))
+        fusion_mean = float(all_features.mean())
+        fusion_std = max(float(all_features.std()), EPSILON)
 
         success = save_personalized_thresholds(
             student_id=student_id,
@@ -249,9 +210,7 @@ def save_baseline():
         if not success:
             return jsonify({"error": "Failed to save baseline"}), 500
 
-        print(f"\n{'='*80}")
-        print(f"[SUCCESS] ✓✓✓ Baseline saved successfully! ✓✓✓")
-        print(f"{'='*80}\n")
+        logger.info("[CALIBRATION] Baseline saved for student %s (threshold %.4f)", student_id, personalized_threshold)
 
         return jsonify({
             "status": "baseline_saved",
@@ -271,7 +230,5 @@ def save_baseline():
         }), 200
 
     except Exception as e:
-        print(f"\n[ERROR] ❌❌❌ Calibration failed: {str(e)} ❌❌❌")
-        import traceback
-        traceback.print_exc()
+        logger.exception("[CALIBRATION] Calibration failed for student %s", student_id)
         return jsonify({"error": f"Calibration failed: {str(e)}"}), 500
\ No newline at end of file
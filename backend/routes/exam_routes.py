@@ -1,235 +1,268 @@
 from flask import Blueprint, request, jsonify
-from utils.db_helpers import get_student_baseline, save_anomaly_record 
-from features.keystroke_feature_extractor import KeystrokeFeatureExtractor
-from features.mouse_feature_extractor import MouseFeatureExtractor
+from utils.db_helpers import get_student_baseline_cached, get_cached_incident_count, increment_incident_count
+from utils.async_writer import anomaly_writer
+from features.keystroke_feature_extractor import KeystrokeFeatureExtractor, KEYSTROKE_FEATURE_NAMES
+from features.mouse_feature_extractor import MouseFeatureExtractor, MOUSE_FEATURE_NAMES
+from utils import load_models
+from utils.infer_batcher import Batcher
+from utils.session_state import get_gated_scores, remember_scores
+from utils.fast_norm import mean_relative_deviation, fuse_scores, SEVERITY_NAMES
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Optional
 import numpy as np
-import pandas as pd
 
 exam_bp = Blueprint('exam', __name__)
+logger = logging.getLogger(__name__)
 
 KEYSTROKE_FE = KeystrokeFeatureExtractor()
 MOUSE_FE = MouseFeatureExtractor()
 
-EPSILON = 1e-6
-KEYSTROKE_FEATURES = [
-    'mean_du_key1_key1', 'mean_dd_key1_key2', 'mean_du_key1_key2', 
-    'mean_ud_key1_key2', 'mean_uu_key1_key2', 'std_du_key1_key1', 
-    'std_dd_key1_key2', 'std_du_key1_key2', 'std_ud_key1_key2', 
-    'std_uu_key1_key2', 'keystroke_count'
-]
-MOUSE_FEATURES = ['inactive_duration', 'copy_cut', 'paste', 'double_click']
+# Run both feature extractors once at import (in the gunicorn master under
+# preload_app) so the first request does not pay for their lazy setup: the
+# keystroke extractor's DataFrame sort and timestamp slicing, and the mouse
+# extractor's fromiter/Counter pass.
+KEYSTROKE_FE.extract_feature_array([
+    {'type': 'keydown', 'timestamp': 0.0}, {'type': 'keyup', 'timestamp': 80.0},
+    {'type': 'keydown', 'timestamp': 150.0}, {'type': 'keyup', 'timestamp': 230.0},
+])
+MOUSE_FE.extract_feature_array([
+    {'event_type': 'click', 'tab': 'active', 'timestamp': 0.0},
+    {'event_type': 'dblclick', 'tab': 'active', 'timestamp': 100.0},
+])
+
+KEYSTROKE_FEATURES = KEYSTROKE_FEATURE_NAMES
+MOUSE_FEATURES = MOUSE_FEATURE_NAMES
+
+INFERENCE_TIMEOUT = 5.0  # seconds to wait for a batched model score
+MIN_KEY_EVENTS = 5     # keystroke extractor needs this many events to be meaningful
+MIN_MOUSE_EVENTS = 10  # below this mouse features are flagged as low quality
+
+
+# One batcher per model: concurrent requests share a single model call
+KEYSTROKE_BATCHER = Batcher(load_models.keystroke_scores, 'keystroke')
+MOUSE_BATCHER = Batcher(load_models.mouse_scores, 'mouse')
+
+
+@dataclass
+class AnalyzeRequest:
+    """Validated /analyze_behavior payload."""
+    student_id: str
+    exam_session_id: str
+    mouse_events: list
+    key_events: list
+    end_timestamp: Optional[float] = None
+
+    @classmethod
+    def from_json(cls, data):
+        """Unpacks the request body once; raises ValueError when it is invalid."""
+        if not isinstance(data, dict):
+            raise ValueError("Request body must be a JSON object")
+        student_id = data.get('student_id')
+        exam_session_id = data.get('exam_session_id') or data.get('calibration_session_id')
+        if not student_id or not exam_session_id:
+            raise ValueError("Missing required identifiers")
+        mouse_events = data.get('mouse_events') or []
+        key_events = data.get('key_events') or []
+        if not isinstance(mouse_events, list) or not isinstance(key_events, list):
+            raise ValueError("mouse_events and key_events must be lists")
+        return cls(student_id, exam_session_id, mouse_events, key_events, data.get('end_timestamp'))
+
+
+# Per-thread scratch buffers. A request thread blocks until its rows are
+# scored (the batcher copies them into its batch), so reusing them on the
+# thread's next request is safe.
+_TLS = threading.local()
+
+
+def _request_buffers():
+    """
+    Returns this thread's float32 buffers:
+    (keystroke features, mouse features, keystroke deviations, mouse deviations).
+    """
+    buffers = getattr(_TLS, 'request_buffers', None)
+    if buffers is None:
+        buffers = (np.empty(len(KEYSTROKE_FEATURES), dtype=np.float32),
+                   np.empty(len(MOUSE_FEATURES), dtype=np.float32),
+                   np.empty(len(KEYSTROKE_FEATURES), dtype=np.float32),
+                   np.empty(len(MOUSE_FEATURES), dtype=np.float32))
+        _TLS.request_buffers = buffers
+    return buffers
+
+
+def _score_rows(k_input, m_input):
+    """
+    Scores one keystroke and one mouse row through the batchers. m_input
+    is None when the window has no mouse signal; the mouse model is then
+    not run and scores 0.0.
+    
+    Returns:
+        (keystroke score, mouse score, True if neither model failed);
+        a failed model scores 0.0.
+    """
+    # Submit both rows before waiting so the two models run concurrently
+    k_future = KEYSTROKE_BATCHER.submit(k_input)
+    m_future = MOUSE_BATCHER.submit(m_input) if m_input is not None else None
+    scored = True
+
+    # Keystroke prediction
+    try:
+        k_score = k_future.result(timeout=INFERENCE_TIMEOUT)
+        logger.debug("[MODELS] Keystroke anomaly: %.6f", k_score)
+    except Exception as e:
+        logger.error("[MODELS] Keystroke model failed: %s", e)
+        k_score = 0.0
+        scored = False
+
+    # Mouse prediction
+    m_score = 0.0
+    if m_future is not None:
+        try:
+            m_score = m_future.result(timeout=INFERENCE_TIMEOUT)
+            logger.debug("[MODELS] Mouse anomaly: %.6f", m_score)
+        except Exception as e:
+            logger.error("[MODELS] Mouse model failed: %s", e)
+            scored = False
+
+    return k_score, m_score, scored
 
 
 @exam_bp.route('/analyze_behavior', methods=['POST'])
 def analyze_behavior():
     """Real-time behavior analysis during exam."""
-    data = request.get_json()
-    
-    student_id = data.get('student_id')
-    exam_session_id = data.get('exam_session_id') or data.get('calibration_session_id')
-    mouse_events = data.get('mouse_events', [])
-    key_events = data.get('key_events', [])
+    try:
+        req = AnalyzeRequest.from_json(request.get_json(cache=False, silent=True))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    student_id = req.student_id
+    exam_session_id = req.exam_session_id
+    mouse_events = req.mouse_events
+    key_events = req.key_events
+    n_key_events = len(key_events)
+    n_mouse_events = len(mouse_events)
 
-    print(f"\n{'='*60}")
-    print(f"[EXAM ANALYSIS] Student: {student_id}, Session: {exam_session_id}")
-    print(f"[EXAM ANALYSIS] Events - Keys: {len(key_events)}, Mouse: {len(mouse_events)}")
-    print(f"{'='*60}\n")
+    logger.debug("[EXAM ANALYSIS] Student: %s, Session: %s, Events - Keys: %d, Mouse: %d",
+                 student_id, exam_session_id, n_key_events, n_mouse_events)
 
-    if not all([student_id, exam_session_id]):
-        return jsonify({"error": "Missing required identifiers"}), 400
+    # Heartbeat with no activity: nothing to extract or score
+    if not key_events and not mouse_events:
+        return jsonify({"status": "idle", "risk_score": 0.0}), 200
+
+    # Check for minimum data before touching the database
+    if n_key_events < MIN_KEY_EVENTS:
+        logger.debug("[EXAM] Insufficient keystroke data (%d/%d)", n_key_events, MIN_KEY_EVENTS)
+        return jsonify({
+            "status": "gathering_data",
+            "risk_score": 0.0,
+            "message": f"Need more keystroke data ({n_key_events}/{MIN_KEY_EVENTS} minimum)"
+        }), 200
 
     try:
         # === STEP 1: Retrieve Baseline ===
-        baseline = get_student_baseline(student_id)
+        baseline = get_student_baseline_cached(student_id)
         if not baseline:
-            print(f"[EXAM] No baseline found")
+            logger.debug("[EXAM] No baseline found for student %s", student_id)
             return jsonify({
                 "status": "no_baseline",
                 "message": "Please complete calibration first",
                 "analysis": None
             }), 200
 
-        baseline_stats = baseline['stats']
         personalized_threshold = baseline.get('system_threshold', 0.7)
         
-        print(f"[BASELINE] Threshold: {personalized_threshold:.4f}")
+        logger.debug("[BASELINE] Threshold: %.4f", personalized_threshold)
 
-        try:
-            k_detailed_stats = baseline_stats['keystroke']['detailed_stats']
-            m_detailed_stats = baseline_stats['mouse']['detailed_stats']
-        except KeyError as e:
-            print(f"[ERROR] Baseline corrupted: {e}")
+        norm = baseline.get('_norm')
+        if norm is None:
+            logger.error("[EXAM] Baseline corrupted for student %s", student_id)
             return jsonify({"error": "Baseline data incomplete"}), 500
 
         # === STEP 2: Extract Current Features ===
-        print("\n[STEP 2] Extracting current raw features...")
+        if n_mouse_events < MIN_MOUSE_EVENTS:
+            logger.debug("[EXAM] Low mouse events: %d (recommended: %d+)", n_mouse_events, MIN_MOUSE_EVENTS)
         
-        # Check for minimum data
-        if len(key_events) < 5:
-            print("[WARNING] Insufficient keystroke data (need at least 5)")
-            return jsonify({
-                "status": "gathering_data",
-                "risk_score": 0.0,
-                "message": f"Need more keystroke data ({len(key_events)}/5 minimum)"
-            }), 200
-        
-        if len(mouse_events) < 10:
-            print(f"[WARNING] Low mouse events: {len(mouse_events)} (recommended: 10+)")
-        
-        k_features_current, _ = KEYSTROKE_FE.extract_features(key_events, baseline_stats=None)
-        m_features_current, _ = MOUSE_FE.extract_features(mouse_events, baseline_stats=None)
+        # Ordered float32 feature rows, fed to the models as-is
+        k_row, m_row, k_buf, m_buf = _request_buffers()
+        k_input = KEYSTROKE_FE.extract_feature_array(key_events, out=k_row)
+        m_input = MOUSE_FE.extract_feature_array(mouse_events, out=m_row)
+        # A window without any mouse events has no mouse signal: the mouse
+        # model is skipped and the fusion falls back to the keystroke score
+        mouse_active = n_mouse_events > 0
 
-        print(f"[FEATURES] Current keystroke: {[f'{v:.2f}' for v in k_features_current[:3]]}")
-        print(f"[FEATURES] Current mouse: {[f'{v:.2f}' for v in m_features_current]}")
+        logger.debug("[FEATURES] Current keystroke: %s", k_input)
+        logger.debug("[FEATURES] Current mouse: %s", m_input)
 
         # === STEP 3: Calculate Deviations from Baseline ===
-        print("\n[STEP 3] Calculating deviations from baseline...")
-        
-        k_deviations = []
-        for i, feat_name in enumerate(KEYSTROKE_FEATURES):
-            current = k_features_current[i]
-            baseline_mean = k_detailed_stats[feat_name]['mean']
-            
-            if baseline_mean != 0:
-                deviation = abs(current - baseline_mean) / abs(baseline_mean)
-            else:
-                deviation = 0.0 if current == 0 else 1.0
-            
-            k_deviations.append(deviation)
-
-        m_deviations = []
-        for i, feat_name in enumerate(MOUSE_FEATURES):
-            current = m_features_current[i]
-            baseline_mean = m_detailed_stats[feat_name]['mean']
-            
-            if baseline_mean != 0:
-                deviation = abs(current - baseline_mean) / abs(baseline_mean)
-            else:
-                deviation = 0.0 if current == 0 else 1.0
-            
-            m_deviations.append(deviation)
-
-        avg_k_deviation = np.mean(k_deviations)
-        avg_m_deviation = np.mean(m_deviations)
-        print(f"[DEVIATION] Keystroke avg: {avg_k_deviation:.2%}")
-        print(f"[DEVIATION] Mouse avg: {avg_m_deviation:.2%}")
+        avg_k_deviation = float(mean_relative_deviation(
+            k_input, norm['k_means'], norm['k_denoms'], norm['k_zero_mean'], k_buf))
+        avg_m_deviation = float(mean_relative_deviation(
+            m_input, norm['m_means'], norm['m_denoms'], norm['m_zero_mean'], m_buf)) if mouse_active else 0.0
+        logger.debug("[DEVIATION] Keystroke avg: %.2f%%, Mouse avg: %.2f%%",
+                     avg_k_deviation * 100, avg_m_deviation * 100)
 
         # === STEP 4: ML Model Predictions ===
-        print("\n[STEP 4] Running ML models...")
-        
-        # Import models (after initialization)
-        from utils.load_models import mouse_model, keystroke_model
-        
-        if keystroke_model is None or mouse_model is None:
-            print("[ERROR] ❌ Models not loaded")
+        if load_models.keystroke_model is None or load_models.mouse_model is None:
+            logger.error("[EXAM] Models not loaded")
             return jsonify({"error": "Models not initialized"}), 500
-        
-        # Prepare inputs
-        k_input = pd.DataFrame([k_features_current], columns=KEYSTROKE_FEATURES)
-        m_input = pd.DataFrame([m_features_current], columns=MOUSE_FEATURES)
-
-        print(f"[MODELS] Keystroke input shape: {k_input.shape}")
-        print(f"[MODELS] Mouse input shape: {m_input.shape}")
 
-        # Keystroke prediction
-        try:
-            k_proba = keystroke_model.predict_proba(k_input)
-            k_score = float(k_proba[0, 1])
-            print(f"[MODELS] ✓ Keystroke anomaly: {k_score:.6f}")
-        except Exception as e:
-            print(f"[ERROR] Keystroke model: {e}")
-            k_score = 0.0
-
-        # Mouse prediction
-        try:
-            if hasattr(mouse_model, 'decision_function'):
-                m_decision = mouse_model.decision_function(m_input)
-                # Positive = anomaly, Negative = normal
-                m_score = float(1.0 / (1.0 + np.exp(-m_decision[0])))
-                print(f"[MODELS] Mouse decision: {m_decision[0]:.6f}")
-                print(f"[MODELS] ✓ Mouse anomaly: {m_score:.6f}")
-            else:
-                m_proba = mouse_model.predict_proba(m_input)
-                m_score = float(m_proba[0, 1])
-                print(f"[MODELS] ✓ Mouse anomaly: {m_score:.6f}")
-        except Exception as e:
-            print(f"[ERROR] Mouse model: {e}")
-            import traceback
-            traceback.print_exc()
-            m_score = 0.0
+        # Idle students produce the same windows over and over; reuse the
+        # last scores instead of rerunning the models on unchanged rows.
+        # Keystroke-only windows bypass the gate: their zero mouse row is
+        # indistinguishable from a clean window that did have mouse events.
+        gated_scores = get_gated_scores(exam_session_id, k_input, m_input) if mouse_active else None
+        if gated_scores is not None:
+            k_score, m_score = gated_scores
+            logger.debug("[MODELS] Features unchanged - reusing last scores")
+        else:
+            k_score, m_score, scored = _score_rows(k_input, m_input if mouse_active else None)
+            if scored and mouse_active:
+                remember_scores(exam_session_id, k_input, m_input, k_score, m_score)
 
         # === STEP 5: Fusion Score ===
-        print("\n[STEP 5] Calculating fusion risk score...")
-        
-        # Weighted average
-        fusion_score = (0.5 * k_score) + (0.5 * m_score)
+        # Weighted average, boosted for extreme behavioral changes; with
+        # only keystrokes active the keystroke score takes both weights
+        fusion_score, severity = fuse_scores(
+            k_score, m_score if mouse_active else k_score, avg_k_deviation, avg_m_deviation)
         
-        # Apply deviation boost for extreme behavioral changes
-        if avg_k_deviation > 1.0 or avg_m_deviation > 1.0:
-            boost = 1.4
-            print(f"[FUSION] Extreme deviation (>100%) - applying {boost}x boost")
-            fusion_score = min(1.0, fusion_score * boost)
-        elif avg_k_deviation > 0.7 or avg_m_deviation > 0.7:
-            boost = 1.2
-            print(f"[FUSION] High deviation (>70%) - applying {boost}x boost")
-            fusion_score = min(1.0, fusion_score * boost)
-        elif avg_k_deviation > 0.5 or avg_m_deviation > 0.5:
-            boost = 1.1
-            print(f"[FUSION] Moderate deviation (>50%) - applying {boost}x boost")
-            fusion_score = min(1.0, fusion_score * boost)
-        
-        print(f"[FUSION] Keystroke: {k_score:.4f}")
-        print(f"[FUSION] Mouse: {m_score:.4f}")
-        print(f"[FUSION] Combined: {fusion_score:.4f}")
-        print(f"[FUSION] Threshold: {personalized_threshold:.4f}")
-        print(f"[FUSION] Exceeded: {fusion_score >= personalized_threshold}")
+        logger.debug("[FUSION] Keystroke: %.4f, Mouse: %.4f, Combined: %.4f, Threshold: %.4f",
+                     k_score, m_score, fusion_score, personalized_threshold)
 
         # === STEP 6: Incident Logging ===
+        # Seed the session count before queuing a write so the new incident
+        # is not counted twice once it lands in the database.
+        incident_count = get_cached_incident_count(exam_session_id)
         incident_logged = False
-        if fusion_score >= personalized_threshold:
-            print(f"\n[ALERT] ⚠️⚠️⚠️ ANOMALY DETECTED ⚠️⚠️⚠️")
-            print(f"[ALERT] Score: {fusion_score:.4f} > Threshold: {personalized_threshold:.4f}")
+        threshold_exceeded = fusion_score >= personalized_threshold
+        if threshold_exceeded:
+            logger.info("[ALERT] Anomaly detected for session %s: score %.4f >= threshold %.4f",
+                        exam_session_id, fusion_score, personalized_threshold)
             
             incident_details = {
                 "keystroke_score": k_score,
                 "mouse_score": m_score,
                 "fusion_score": fusion_score,
                 "threshold": personalized_threshold,
-                "timestamp": data.get('end_timestamp'),
+                "timestamp": req.end_timestamp,
                 "exceeded_by": fusion_score - personalized_threshold,
                 "avg_keystroke_deviation": avg_k_deviation,
                 "avg_mouse_deviation": avg_m_deviation,
-                "keystroke_event_count": len(key_events),
-                "mouse_event_count": len(mouse_events)
+                "keystroke_event_count": n_key_events,
+                "mouse_event_count": n_mouse_events
             }
             
-            incident_logged = save_anomaly_record(
+            # Written in the background; True once the record is queued
+            incident_logged = anomaly_writer.submit(
                 session_id=exam_session_id,
                 final_risk_score=fusion_score,
                 incident_details=incident_details
             )
-            
             if incident_logged:
-                print(f"[INCIDENT] ✓ Logged to database")
-        else:
-            print(f"\n[STATUS] ✓ Normal behavior")
+                incident_count = increment_incident_count(exam_session_id)
 
         # === STEP 7: Count Total Incidents ===
-        from utils.db_helpers import supabase
-        incident_count = 0
-        try:
-            response = supabase.table('cheating_incidents')\
-                .select('id')\
-                .eq('session_id', exam_session_id)\
-                .execute()
-            
-            if hasattr(response, 'data') and response.data:
-                incident_count = len(response.data)
-        except Exception as e:
-            print(f"[ERROR] Count incidents: {e}")
-
-        print(f"[SUMMARY] Total incidents this session: {incident_count}")
-        print(f"{'='*60}\n")
+        logger.debug("[SUMMARY] Total incidents this session: %d", incident_count)
 
         # === STEP 8: Return Analysis ===
         return jsonify({
@@ -239,22 +272,21 @@ def analyze_behavior():
                 "mouse_score": float(m_score),
                 "fusion_risk_score": float(fusion_score),
                 "personalized_threshold": float(personalized_threshold),
-                "threshold_exceeded": fusion_score >= personalized_threshold,
+                "threshold_exceeded": threshold_exceeded,
                 "incident_logged": incident_logged,
                 "cheating_incident_count": incident_count,
-                "severity": "high" if fusion_score >= 0.8 else "medium" if fusion_score >= 0.6 else "low",
+                "severity": SEVERITY_NAMES[severity],
                 "avg_keystroke_deviation": float(avg_k_deviation),
                 "avg_mouse_deviation": float(avg_m_deviation),
+                "active_modalities": ["keystroke", "mouse"] if mouse_active else ["keystroke"],
                 "data_quality": {
-                    "keystroke_events": len(key_events),
-                    "mouse_events": len(mouse_events),
-                    "sufficient_data": len(key_events) >= 5 and len(mouse_events) >= 10
+                    "keystroke_events": n_key_events,
+                    "mouse_events": n_mouse_events,
+                    "sufficient_data": n_key_events >= MIN_KEY_EVENTS and n_mouse_events >= MIN_MOUSE_EVENTS
                 }
             }
         }), 200
 
     except Exception as e:
-        print(f"\n[ERROR] Analysis failed: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("[EXAM] Analysis failed")
         return jsonify({"error": f"Analysis failed: {str(e)}"}), 500
\ No newline at end of file
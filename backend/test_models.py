@@ -6,7 +6,6 @@ Run this from the backend directory: python test_models.py
 import sys
 import os
 import numpy as np
-import pandas as pd
 
 # Add backend to path
 sys.path.insert(0, os.path.dirname(__file__))
@@ -78,13 +77,14 @@ m_sample = [
     1.0    # double_click (count)
 ]
 
-k_input = pd.DataFrame([k_sample], columns=KEYSTROKE_FEATURES)
-m_input = pd.DataFrame([m_sample], columns=MOUSE_FEATURES)
+# Plain ndarrays in feature order, as the exam route feeds the models
+k_input = np.array([k_sample], dtype=np.float32)
+m_input = np.array([m_sample], dtype=np.float32)
 
 print(f"✓ Keystroke input shape: {k_input.shape}")
 print(f"✓ Mouse input shape: {m_input.shape}")
-print(f"\nKeystroke sample:\n{k_input.head()}")
-print(f"\nMouse sample:\n{m_input.head()}")
+print(f"\nKeystroke sample:\n{dict(zip(KEYSTROKE_FEATURES, k_sample))}")
+print(f"\nMouse sample:\n{dict(zip(MOUSE_FEATURES, m_sample))}")
 
 # Test 5: Keystroke model prediction
 print("\n[TEST 5] Testing keystroke model prediction...")
@@ -158,25 +158,44 @@ m_abnormal = [
     0.0
 ]
 
-k_abnormal_input = pd.DataFrame([k_abnormal], columns=KEYSTROKE_FEATURES)
-m_abnormal_input = pd.DataFrame([m_abnormal], columns=MOUSE_FEATURES)
+# Normal and abnormal rows stacked so each model is called once for both
+k_batch = np.array([k_sample, k_abnormal], dtype=np.float32)
+m_batch = np.array([m_sample, m_abnormal], dtype=np.float32)
 
 try:
     if hasattr(keystroke_model, 'predict_proba'):
-        k_abnormal_proba = keystroke_model.predict_proba(k_abnormal_input)
-        print(f"✓ Abnormal keystroke anomaly prob: {k_abnormal_proba[0, 1]:.6f}")
+        k_batch_proba = keystroke_model.predict_proba(k_batch)
+        print(f"✓ Normal keystroke anomaly prob: {k_batch_proba[0, 1]:.6f}")
+        print(f"✓ Abnormal keystroke anomaly prob: {k_batch_proba[1, 1]:.6f}")
     
     if hasattr(mouse_model, 'decision_function'):
-        m_abnormal_decision = mouse_model.decision_function(m_abnormal_input)
-        print(f"✓ Abnormal mouse decision: {m_abnormal_decision[0]:.6f}")
-        print(f"✓ Abnormal mouse anomaly score: {max(0.0, -m_abnormal_decision[0]):.6f}")
+        m_batch_decision = mouse_model.decision_function(m_batch)
+        print(f"✓ Normal mouse decision: {m_batch_decision[0]:.6f}")
+        print(f"✓ Abnormal mouse decision: {m_batch_decision[1]:.6f}")
+        print(f"✓ Abnormal mouse anomaly score: {max(0.0, -m_batch_decision[1]):.6f}")
     elif hasattr(mouse_model, 'predict_proba'):
-        m_abnormal_proba = mouse_model.predict_proba(m_abnormal_input)
-        print(f"✓ Abnormal mouse anomaly prob: {m_abnormal_proba[0, 1]:.6f}")
+        m_batch_proba = mouse_model.predict_proba(m_batch)
+        print(f"✓ Abnormal mouse anomaly prob: {m_batch_proba[1, 1]:.6f}")
         
 except Exception as e:
     print(f"❌ Abnormal behavior test failed: {e}")
 
+# Test 8: float32 parity
+print("\n[TEST 8] Checking float32 inputs match float64...")
+try:
+    from utils.load_models import keystroke_scores, mouse_scores
+    for name, score_fn, batch in (('Keystroke', keystroke_scores, k_batch),
+                                  ('Mouse', mouse_scores, m_batch)):
+        scores32 = score_fn(batch)
+        scores64 = score_fn(batch.astype(np.float64))
+        max_diff = float(np.max(np.abs(scores32 - scores64)))
+        if max_diff <= 1e-4:
+            print(f"✓ {name} float32/float64 max score difference: {max_diff:.2e}")
+        else:
+            print(f"⚠️  {name} float32 scores differ from float64 by {max_diff:.2e}")
+except Exception as e:
+    print(f"❌ float32 parity check failed: {e}")
+
 # Summary
 print("\n" + "="*60)
 print("TEST SUMMARY")
@@ -0,0 +1,55 @@
+"""
+Re-dump the model files with pickle protocol 5 (uncompressed).
+Run this in backend directory: python upgrade_pickle_protocol.py
+"""
+
+import joblib
+import os
+import sys
+
+from utils.load_models import _MODEL_PATHS, pickle_protocol
+
+
+def upgrade_pickle_protocol():
+    """Rewrite every model file in models/ with protocol 5"""
+    
+    models_dir = 'models'
+    
+    if not os.path.exists(models_dir):
+        print("❌ 'models' directory not found!")
+        print("   Run this from your backend directory")
+        sys.exit(1)
+    
+    print("\n" + "="*70)
+    print("PICKLE PROTOCOL UPGRADE")
+    print("="*70 + "\n")
+    
+    for filename in _MODEL_PATHS.values():
+        path = os.path.join(models_dir, filename)
+        if not os.path.exists(path):
+            print(f"  - {filename}: not found, skipped")
+            continue
+        
+        protocol = pickle_protocol(path)
+        if protocol is not None and protocol >= 5:
+            print(f"  ✓ {filename}: already protocol {protocol}")
+            continue
+        
+        model = joblib.load(path)
+        # compress=0 keeps the file memory-mappable (see load_models._load_mmap)
+        joblib.dump(model, path, protocol=5, compress=0)
+        print(f"  ✓ {filename}: protocol {protocol} -> {pickle_protocol(path)}")
+    
+    print("\n" + "="*70)
+    print("UPGRADE COMPLETE - restart the backend to load the new files")
+    print("="*70 + "\n")
+
+
+if __name__ == "__main__":
+    try:
+        upgrade_pickle_protocol()
+    except Exception as e:
+        print(f"\n❌ ERROR: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,120 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+from utils.db_helpers import save_anomaly_records
+
+logger = logging.getLogger(__name__)
+
+MAX_QUEUE = 10_000   # pending records before new ones are dead-lettered
+MAX_BATCH = 50       # records per insert
+FLUSH_INTERVAL = 1.0 # seconds to collect more records after the first one
+MAX_RETRIES = 3      # attempts per batch
+RETRY_DELAY = 0.5    # seconds, doubled after each failed attempt
+EXIT_FLUSH_TIMEOUT = 5.0  # seconds to wait for pending writes at interpreter exit
+
+
+class AsyncWriter:
+    """
+    Runs database writes on a background thread so request handlers do not
+    wait on the Supabase round-trip.
+
+    Records given to submit() are collected for up to FLUSH_INTERVAL (at most
+    MAX_BATCH of them) and passed to write_fn as one list, which must return
+    True on success. Failed batches are retried; records that still fail, or
+    that arrive while the queue is full, are logged as dead letters.
+    Pending records are flushed when the process exits.
+    """
+
+    def __init__(self, write_fn, name: str, maxsize: int = MAX_QUEUE,
+                 max_batch: int = MAX_BATCH, flush_interval: float = FLUSH_INTERVAL):
+        self.write_fn = write_fn
+        self.name = name
+        self.maxsize = maxsize
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_worker(self):
+        """Starts the worker thread on first use in this process (threads do not survive fork)."""
+        pid = os.getpid()
+        if self._pid == pid and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == pid and self._thread.is_alive():
+                return
+            self._queue = queue.Queue(maxsize=self.maxsize)
+            self._thread = threading.Thread(
+                target=self._run, args=(self._queue,), name=f"writer-{self.name}", daemon=True
+            )
+            self._thread.start()
+            self._pid = pid
+
+    def submit(self, **record) -> bool:
+        """
+        Queues a record for writing.
+
+        Returns:
+            bool: True if queued, False if the queue is full (record dead-lettered)
+        """
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            logger.error("[DEAD LETTER] %s queue full, dropping record: %s", self.name, record)
+            return False
+
+    def flush(self, timeout: float = EXIT_FLUSH_TIMEOUT) -> bool:
+        """
+        Waits until every queued record has been written or dead-lettered.
+
+        Returns:
+            bool: False if records were still pending after timeout
+        """
+        q = self._queue
+        if q is None or self._pid != os.getpid():
+            return True
+        deadline = time.monotonic() + timeout
+        while q.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                logger.error("[DEAD LETTER] %s: %d record(s) unwritten at exit", self.name, q.unfinished_tasks)
+                return False
+            time.sleep(0.05)
+        return True
+
+    def _run(self, q):
+        while True:
+            batch = [q.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(q.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            delay = RETRY_DELAY
+            for attempt in range(MAX_RETRIES):
+                if self.write_fn(batch):
+                    break
+                if attempt + 1 < MAX_RETRIES:
+                    time.sleep(delay)
+                    delay *= 2
+            else:
+                logger.error("[DEAD LETTER] %s write failed %d times: %s", self.name, MAX_RETRIES, batch)
+            for _ in batch:
+                q.task_done()
+
+
+# Incident inserts from the exam analysis path
+anomaly_writer = AsyncWriter(save_anomaly_records, 'anomaly')
+atexit.register(anomaly_writer.flush)
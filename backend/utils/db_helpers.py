@@ -1,23 +1,44 @@
 import os
 import json
+import logging
+import threading
+import time
+import uuid
+import numpy as np
+from postgrest import ReturnMethod
 from supabase import create_client, Client
+from supabase.lib.client_options import ClientOptions
 from flask import current_app
+from features.keystroke_feature_extractor import KEYSTROKE_FEATURE_NAMES
+from features.mouse_feature_extractor import MOUSE_FEATURE_NAMES
+from utils.fast_norm import SEVERITY_NAMES, severity_index
+
+logger = logging.getLogger(__name__)
 
 # Supabase initialization
 SUPABASE_URL = os.environ.get("SUPABASE_URL")
 SUPABASE_SERVICE_KEY = os.environ.get("SUPABASE_SERVICE_KEY")
+# Seconds before a PostgREST call gives up; the client's default of 120s
+# would hold a request thread (or the background writer) that long
+SUPABASE_TIMEOUT = float(os.environ.get("SUPABASE_TIMEOUT", 10))
 
 if not SUPABASE_URL or not SUPABASE_SERVICE_KEY:
-    print("WARNING: Supabase URL or Service Key not found in environment variables.")
+    logger.warning("Supabase URL or Service Key not found in environment variables.")
 
+# One client per process, shared by every request thread and the
+# background writers: its HTTP session keeps connections to Supabase alive
+# between calls instead of reconnecting (and redoing TLS) for each query.
 try:
-    supabase: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+    supabase: Client = create_client(
+        SUPABASE_URL, SUPABASE_SERVICE_KEY,
+        options=ClientOptions(postgrest_client_timeout=SUPABASE_TIMEOUT)
+    )
 except Exception as e:
-    print(f"Failed to initialize Supabase client: {e}")
+    logger.error("Failed to initialize Supabase client: %s", e)
     class DummySupabase:
         def table(self, name): return self
-        def insert(self, data): return self
-        def update(self, data): return self
+        def insert(self, data, **kwargs): return self
+        def update(self, data, **kwargs): return self
         def select(self, columns): return self
         def eq(self, column, value): return self
         def order(self, column, desc): return self
@@ -40,7 +61,7 @@ def create_calibration_session(student_id: str):
         
         return response.data["id"]
     except Exception as e:
-        print(f"Error creating calibration session: {e}")
+        logger.error("Error creating calibration session: %s", e)
         return None
 
 
@@ -78,20 +99,14 @@ def save_personalized_thresholds(
         - updated_at: timestamp (auto)
     """
     try:
-        import uuid
         baseline_id = str(uuid.uuid4())
         
-        # Prepare the baseline_stats for JSON storage
-        baseline_json = json.dumps(baseline_stats)
-        
-        print(f"\n[DB SAVE] Saving threshold to database...")
-        print(f"[DB SAVE] Student ID: {student_id}")
-        print(f"[DB SAVE] Calibration Session ID: {session_id}")
-        print(f"[DB SAVE] Threshold: {calculated_threshold}")
-        print(f"[DB SAVE] Fusion mean: {fusion_mean}, std: {fusion_std}")
-        print(f"[DB SAVE] Course: {course_name}")
+        logger.debug("[DB SAVE] Saving threshold - student: %s, calibration session: %s, "
+                     "threshold: %s, fusion mean: %s, std: %s, course: %s",
+                     student_id, session_id, calculated_threshold, fusion_mean, fusion_std, course_name)
         
-        # Insert into personal_thresholds table
+        # Insert into personal_thresholds table; the row is not read back
+        # (minimal return), so the baseline_stats blob is not echoed
         # IMPORTANT: The column name is 'calibration_session_id' not 'session_id'
         response = supabase.table("personal_thresholds").insert({
             "id": baseline_id,
@@ -100,32 +115,44 @@ def save_personalized_thresholds(
             "fusion_mean": float(fusion_mean),
             "fusion_std": float(fusion_std),
             "threshold": float(calculated_threshold),  # Maps to threshold column
-            "baseline_stats": baseline_json,
+            "baseline_stats": baseline_stats,  # jsonb column: stored as an object, not a string
             "course_name": course_name
             # created_at and updated_at are auto-generated by database defaults
-        }).execute()
+        }, returning=ReturnMethod.minimal).execute()
         
         # Check for errors
         if hasattr(response, 'error') and response.error:
-            print(f"[DB ERROR] Supabase error: {response.error}")
+            logger.error("[DB ERROR] Supabase error: %s", response.error)
             return False
         
+        # Exam requests must see the new baseline immediately
+        invalidate_student_baseline(student_id)
+        
         # Mark calibration session as completed
         supabase.table("calibration_sessions").update({
             "status": "completed",
             "completed_at": "now()"
-        }).eq("id", session_id).execute()
+        }, returning=ReturnMethod.minimal).eq("id", session_id).execute()
         
-        print(f"[DB SAVE] ✓ Threshold saved successfully! Row ID: {baseline_id}")
+        logger.info("[DB SAVE] Threshold saved for student %s (row %s)", student_id, baseline_id)
         return True
         
     except Exception as e:
-        print(f"[DB ERROR] Failed to save personalized threshold: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("[DB ERROR] Failed to save personalized threshold")
         return False
 
 
+def _fetch_latest_baseline_row(student_id: str, columns: str):
+    """Returns the given columns of a student's most recent personal_thresholds row, or None."""
+    response = supabase.table("personal_thresholds")\
+        .select(columns)\
+        .eq("student_id", student_id)\
+        .order("created_at", desc=True)\
+        .limit(1)\
+        .execute()
+    return response.data[0] if response.data else None
+
+
 def get_student_baseline(student_id: str):
     """
     Retrieves the most recent personalized baseline for a student.
@@ -146,33 +173,40 @@ def get_student_baseline(student_id: str):
         Returns None if no baseline found.
     """
     try:
-        print(f"\n[DB FETCH] Retrieving baseline for student: {student_id}")
+        logger.debug("[DB FETCH] Retrieving baseline for student: %s", student_id)
         
-        # Fetch the most recent baseline for this student
-        response = supabase.table("personal_thresholds")\
-            .select("baseline_stats, threshold")\
-            .eq("student_id", student_id)\
-            .order("created_at", desc=True)\
-            .limit(1)\
-            .execute()
-        
-        if not response.data or len(response.data) == 0:
-            print(f"[DB FETCH] No baseline found for student {student_id}")
+        # Fetch only the per-feature stats of the most recent baseline; the
+        # jsonb paths are resolved by the database, not shipped whole.
+        baseline_data = _fetch_latest_baseline_row(
+            student_id,
+            "k_stats:baseline_stats->keystroke->detailed_stats, "
+            "m_stats:baseline_stats->mouse->detailed_stats, threshold"
+        )
+        if baseline_data is None:
+            logger.debug("[DB FETCH] No baseline found for student %s", student_id)
             return None
         
-        baseline_data = response.data[0]
-        baseline_stats_raw = baseline_data.get("baseline_stats")
         threshold = baseline_data.get("threshold")
+        k_stats = baseline_data.get("k_stats")
+        m_stats = baseline_data.get("m_stats")
         
-        if not baseline_stats_raw:
-            print(f"[DB FETCH] Baseline stats missing in database")
-            return None
-        
-        # Parse the JSON baseline stats (it might already be a dict or a string)
-        if isinstance(baseline_stats_raw, str):
-            baseline_stats = json.loads(baseline_stats_raw)
+        if k_stats is not None and m_stats is not None:
+            baseline_stats = {
+                'keystroke': {'detailed_stats': k_stats},
+                'mouse': {'detailed_stats': m_stats}
+            }
         else:
-            baseline_stats = baseline_stats_raw
+            # Rows saved before baseline_stats was written as an object hold
+            # a JSON string, which the paths above cannot look into.
+            baseline_data = _fetch_latest_baseline_row(student_id, "baseline_stats") or {}
+            baseline_stats_raw = baseline_data.get("baseline_stats")
+            if not baseline_stats_raw:
+                logger.warning("[DB FETCH] Baseline stats missing in database for student %s", student_id)
+                return None
+            if isinstance(baseline_stats_raw, str):
+                baseline_stats = json.loads(baseline_stats_raw)
+            else:
+                baseline_stats = baseline_stats_raw
         
         # Construct the result in the expected format
         result = {
@@ -180,20 +214,119 @@ def get_student_baseline(student_id: str):
             "system_threshold": float(threshold)
         }
         
-        print(f"[DB FETCH] ✓ Baseline retrieved successfully")
-        print(f"[DB FETCH] Threshold: {threshold}")
-        print(f"[DB FETCH] Has keystroke stats: {'keystroke' in baseline_stats}")
-        print(f"[DB FETCH] Has mouse stats: {'mouse' in baseline_stats}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[DB FETCH] Baseline retrieved - threshold: %s, keystroke stats: %s, mouse stats: %s",
+                         threshold, 'keystroke' in baseline_stats, 'mouse' in baseline_stats)
         
         return result
         
     except Exception as e:
-        print(f"[DB ERROR] Failed to retrieve baseline: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("[DB ERROR] Failed to retrieve baseline")
         return None
 
 
+# In-process cache of parsed baselines keyed by student_id. Baselines only
+# change when a calibration is saved, so exam requests can reuse them.
+# A save invalidates only the worker that handled it; the TTL bounds how
+# long the other gunicorn workers can serve the previous baseline.
+BASELINE_CACHE_TTL = float(os.environ.get("BASELINE_CACHE_TTL", 60))  # seconds
+BASELINE_CACHE_MAXSIZE = 4096  # oldest entries are dropped beyond this
+_baseline_cache = {}
+_baseline_cache_lock = threading.Lock()
+
+
+def _precompute_norm_arrays(baseline_stats: dict):
+    """
+    Builds the per-feature baseline arrays used on the exam hot path, in
+    the same order as the feature extractors emit them.
+    
+    Returns:
+        Dict with float32 arrays per modality ('k_' / 'm_' prefix):
+        '*_means' (baseline means), '*_denoms' (|mean|, or 1.0 where the mean
+        is zero) and boolean '*_zero_mean' masks. None if the stored
+        baseline is missing features.
+    """
+    try:
+        k_stats = baseline_stats['keystroke']['detailed_stats']
+        m_stats = baseline_stats['mouse']['detailed_stats']
+        norm = {
+            'k_means': np.fromiter((k_stats[name]['mean'] for name in KEYSTROKE_FEATURE_NAMES),
+                                   dtype=np.float32, count=len(KEYSTROKE_FEATURE_NAMES)),
+            'm_means': np.fromiter((m_stats[name]['mean'] for name in MOUSE_FEATURE_NAMES),
+                                   dtype=np.float32, count=len(MOUSE_FEATURE_NAMES)),
+        }
+        for prefix in ('k', 'm'):
+            means = norm[f'{prefix}_means']
+            zero_mean = means == 0
+            norm[f'{prefix}_zero_mean'] = zero_mean
+            norm[f'{prefix}_denoms'] = np.where(zero_mean, np.float32(1.0), np.abs(means))
+        # Shared by every request for this student; in-place math must
+        # write to its own buffers, never to these.
+        for array in norm.values():
+            array.flags.writeable = False
+        return norm
+    except (KeyError, TypeError) as e:
+        logger.warning("[DB FETCH] Baseline stats incomplete: %s", e)
+        return None
+
+
+def get_student_baseline_cached(student_id: str):
+    """
+    Cached wrapper around get_student_baseline.
+    
+    Args:
+        student_id: UUID of the student
+    
+    Returns:
+        The same dict as get_student_baseline plus '_norm' (see
+        _precompute_norm_arrays), or None if no baseline found.
+        Missing baselines are not cached so a fresh calibration is picked up.
+    """
+    now = time.monotonic()
+    with _baseline_cache_lock:
+        entry = _baseline_cache.get(student_id)
+    if entry is not None and entry[0] > now:
+        return entry[1]
+    
+    baseline = get_student_baseline(student_id)
+    if baseline is not None:
+        baseline['_norm'] = _precompute_norm_arrays(baseline['stats'])
+        with _baseline_cache_lock:
+            # Re-insert so dict order stays oldest-first for eviction
+            _baseline_cache.pop(student_id, None)
+            while len(_baseline_cache) >= BASELINE_CACHE_MAXSIZE:
+                del _baseline_cache[next(iter(_baseline_cache))]
+            _baseline_cache[student_id] = (now + BASELINE_CACHE_TTL, baseline)
+    return baseline
+
+
+def invalidate_student_baseline(student_id: str):
+    """
+    Drops the cached baseline for a student. Called by
+    save_personalized_thresholds once a new calibration is stored.
+    """
+    with _baseline_cache_lock:
+        _baseline_cache.pop(student_id, None)
+
+
+def _anomaly_row(session_id: str, final_risk_score: float, incident_details: dict):
+    """
+    Builds one cheating_incidents row for save_anomaly_record(s). Runs on
+    the anomaly writer thread, so the formatting stays off the request path.
+    """
+    severity = SEVERITY_NAMES[severity_index(final_risk_score)]
+    
+    return {
+        'session_id': session_id,
+        'incident_type': 'behavioral_anomaly',
+        'description': f"Fusion risk score of {final_risk_score:.2f} detected",
+        'severity_score': float(final_risk_score),
+        'severity': severity,
+        'details': incident_details  # jsonb column: stored as an object, not a string
+        # timestamp is auto-generated
+    }
+
+
 def save_anomaly_record(session_id: str, final_risk_score: float, incident_details: dict):
     """
     Logs a cheating incident to the database.
@@ -213,33 +346,32 @@ def save_anomaly_record(session_id: str, final_risk_score: float, incident_detai
         - details: jsonb
         - timestamp: timestamp (auto)
     """
-    try:
-        # Determine severity based on risk score
-        if final_risk_score >= 0.8:
-            severity = "high"
-        elif final_risk_score >= 0.6:
-            severity = "medium"
-        else:
-            severity = "low"
+    return save_anomaly_records([{
+        'session_id': session_id,
+        'final_risk_score': final_risk_score,
+        'incident_details': incident_details
+    }])
+
+
+def save_anomaly_records(records: list):
+    """
+    Logs several cheating incidents with a single multi-row insert.
+    
+    Args:
+        records: List of dicts with save_anomaly_record's keyword arguments
         
-        # Insert incident record
-        supabase.table('cheating_incidents').insert({
-            'session_id': session_id,
-            'incident_type': 'behavioral_anomaly',
-            'description': f"Fusion risk score of {final_risk_score:.2f} detected",
-            'severity_score': float(final_risk_score),
-            'severity': severity,
-            'details': json.dumps(incident_details)
-            # timestamp is auto-generated
-        }).execute()
+    Returns:
+        bool: True if all rows were inserted
+    """
+    try:
+        supabase.table('cheating_incidents').insert([_anomaly_row(**record) for record in records],
+                                                    returning=ReturnMethod.minimal).execute()
         
-        print(f"[DB SAVE] ✓ Anomaly record saved (severity: {severity}, score: {final_risk_score:.2f})")
+        logger.debug("[DB SAVE] %d anomaly record(s) saved", len(records))
         return True
         
     except Exception as e:
-        print(f"[DB ERROR] Failed to save anomaly record: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("[DB ERROR] Failed to save anomaly records")
         return False
 
 
@@ -254,13 +386,72 @@ def get_student_incident_count(session_id: str):
         int: Number of incidents recorded
     """
     try:
+        # count='exact' returns the total in the response header; limit(1)
+        # keeps the body to at most one row instead of every incident.
         response = supabase.table('cheating_incidents')\
             .select('id', count='exact')\
             .eq('session_id', session_id)\
+            .limit(1)\
             .execute()
         
-        return response.count if hasattr(response, 'count') else 0
+        return getattr(response, 'count', None) or 0
         
     except Exception as e:
-        print(f"[DB ERROR] Failed to count incidents: {e}")
-        return 0
\ No newline at end of file
+        logger.error("[DB ERROR] Failed to count incidents: %s", e)
+        return 0
+
+
+# Per-session incident counts, seeded from the database and bumped locally
+# when this process logs an incident. Entries are re-seeded after
+# INCIDENT_COUNT_TTL so incidents logged by other workers show up; a re-seed
+# keeps the larger of the database and local counts.
+INCIDENT_COUNT_TTL = 60  # seconds
+INCIDENT_COUNT_MAXSIZE = 4096  # oldest entries are dropped beyond this
+_incident_counts = {}
+_incident_counts_lock = threading.Lock()
+
+
+def get_cached_incident_count(session_id: str):
+    """
+    Cached wrapper around get_student_incident_count.
+    
+    Args:
+        session_id: UUID of the exam session
+        
+    Returns:
+        int: Number of incidents recorded
+    """
+    now = time.monotonic()
+    with _incident_counts_lock:
+        entry = _incident_counts.get(session_id)
+    if entry is not None and entry[0] > now:
+        return entry[1]
+    
+    count = get_student_incident_count(session_id)
+    with _incident_counts_lock:
+        # Incidents this worker queued may not be flushed (or were
+        # dead-lettered), so never let the count go backwards
+        previous = _incident_counts.pop(session_id, None)
+        if previous is not None:
+            count = max(count, previous[1])
+        # Re-insert so dict order stays oldest-first for eviction
+        while len(_incident_counts) >= INCIDENT_COUNT_MAXSIZE:
+            del _incident_counts[next(iter(_incident_counts))]
+        _incident_counts[session_id] = (now + INCIDENT_COUNT_TTL, count)
+    return count
+
+
+def increment_incident_count(session_id: str):
+    """
+    Records one more incident for a session in the local count.
+    
+    Returns:
+        int: Updated number of incidents
+    """
+    seeded = get_cached_incident_count(session_id)
+    with _incident_counts_lock:
+        # The entry may have been evicted since it was seeded
+        expires, count = _incident_counts.get(
+            session_id, (time.monotonic() + INCIDENT_COUNT_TTL, seeded))
+        _incident_counts[session_id] = (expires, count + 1)
+    return count + 1
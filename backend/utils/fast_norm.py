@@ -0,0 +1,50 @@
+import numpy as np
+
+
+def mean_relative_deviation(x, means, denoms, zero_mean, out):
+    """
+    Writes |x - mean| / |mean| per feature into out and returns its mean.
+    Features with a zero baseline mean count as 0.0 while x is still zero
+    and 1.0 otherwise. means/denoms/zero_mean come precomputed with the
+    cached baseline.
+    """
+    np.subtract(x, means, out=out)
+    np.abs(out, out=out)
+    np.divide(out, denoms, out=out)
+    if zero_mean.any():
+        out[zero_mean] = x[zero_mean] != 0
+    return float(out.mean())
+
+
+# Incident severity buckets, indexed by severity_index()
+SEVERITY_NAMES = ('low', 'medium', 'high')
+
+
+def severity_index(risk_score):
+    """Returns the SEVERITY_NAMES index for a fusion risk score."""
+    if risk_score >= 0.8:
+        return 2
+    if risk_score >= 0.6:
+        return 1
+    return 0
+
+
+def fuse_scores(k_score, m_score, avg_k_deviation, avg_m_deviation):
+    """
+    Combines the keystroke and mouse scores into the fusion risk score:
+    their average, boosted (capped at 1.0) when either modality deviates
+    strongly from the student's baseline.
+    
+    Returns:
+        (fusion_score, severity index into SEVERITY_NAMES)
+    """
+    fusion_score = 0.5 * k_score + 0.5 * m_score
+    max_deviation = max(avg_k_deviation, avg_m_deviation)
+    if max_deviation > 1.0:
+        fusion_score = min(1.0, fusion_score * 1.4)
+    elif max_deviation > 0.7:
+        fusion_score = min(1.0, fusion_score * 1.2)
+    elif max_deviation > 0.5:
+        fusion_score = min(1.0, fusion_score * 1.1)
+    return fusion_score, severity_index(fusion_score)
+
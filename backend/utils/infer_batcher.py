@@ -0,0 +1,89 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+# Batching knobs, overridable per deployment
+MAX_BATCH = int(os.environ.get('INFER_MAX_BATCH_SIZE', 32))               # rows per model call
+MAX_WAIT = float(os.environ.get('INFER_MAX_BATCH_DURATION_SECS', 0.01))  # seconds to wait for more rows after the first one
+
+
+class Batcher:
+    """
+    Micro-batches single-row inference requests.
+    
+    Request threads submit one feature row each; a background worker stacks
+    whatever arrives within MAX_WAIT (up to MAX_BATCH rows), scores the batch
+    with one call to score_fn and hands each row's score back via a Future.
+    
+    score_fn must map an (n, d) array to n scores.
+    """
+
+    def __init__(self, score_fn, name: str, max_batch: int = MAX_BATCH, max_wait: float = MAX_WAIT):
+        self.score_fn = score_fn
+        self.name = name
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_worker(self):
+        """
+        Starts the worker thread on first use in this process. Threads do not
+        survive fork, so under gunicorn's preload_app every worker process
+        starts its own.
+        """
+        pid = os.getpid()
+        if self._pid == pid and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == pid and self._thread.is_alive():
+                return
+            self._queue = queue.Queue()
+            self._thread = threading.Thread(
+                target=self._run, args=(self._queue,), name=f"batcher-{self.name}", daemon=True
+            )
+            self._thread.start()
+            self._pid = pid
+
+    def submit(self, row) -> Future:
+        """Queues a 1-D feature row and returns a Future for its score."""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((row, future))
+        return future
+
+    def score(self, row, timeout: float = None) -> float:
+        """Blocking helper: submit a row and wait for its score."""
+        return self.submit(row).result(timeout=timeout)
+
+    def _run(self, q):
+        while True:
+            items = [q.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(items) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    items.append(q.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            try:
+                batch = np.ascontiguousarray(np.vstack([row for row, _ in items]), dtype=np.float32)
+                scores = self.score_fn(batch)
+                if len(scores) != len(items):
+                    raise ValueError(f"{self.name} model returned {len(scores)} scores for {len(items)} rows")
+            except Exception as e:
+                for _, future in items:
+                    future.set_exception(e)
+                continue
+
+            for (_, future), score in zip(items, scores):
+                future.set_result(float(score))
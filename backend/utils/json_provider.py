@@ -0,0 +1,43 @@
+import decimal
+
+import orjson
+from flask.json.provider import JSONProvider
+
+
+def _default(o):
+    """Fallback for types orjson does not serialize natively."""
+    if isinstance(o, decimal.Decimal):
+        return str(o)
+    if hasattr(o, "__html__"):
+        return str(o.__html__())
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+# NumPy scalars and arrays are serialized natively, without float() casts
+_OPTIONS = orjson.OPT_SERIALIZE_NUMPY
+
+
+class OrjsonProvider(JSONProvider):
+    """
+    Flask JSON provider backed by orjson (C implementation), used for both
+    request parsing (request.get_json) and responses (jsonify).
+    """
+
+    def __init__(self, app):
+        super().__init__(app)
+        # Kept here rather than relying on JSONProvider's private _app
+        self.app = app
+
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj, default=_default, option=_OPTIONS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        """jsonify: builds the body as bytes directly, skipping the str round-trip of dumps."""
+        if args and kwargs:
+            raise TypeError("app.json.response() takes either args or kwargs, not both")
+        obj = args[0] if len(args) == 1 else (args or kwargs)
+        body = orjson.dumps(obj, default=_default, option=_OPTIONS | orjson.OPT_APPEND_NEWLINE)
+        return self.app.response_class(body, mimetype="application/json")
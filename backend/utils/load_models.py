@@ -1,159 +1,611 @@
+import functools
 import joblib
+import logging
 import os
+import warnings
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+import numpy as np
+import sklearn
+from scipy.special import expit
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.svm import SVC
+from threadpoolctl import threadpool_limits
 
-# Global variables to hold models AND scalers
+logger = logging.getLogger(__name__)
+
+# Global variables to hold models AND scalers.
+# These are loaded once by init_models() (in the gunicorn master when
+# preload_app is set) and must be treated as read-only afterwards so the
+# forked workers keep sharing the same memory pages.
 mouse_model = None
 keystroke_model = None
 mouse_scaler = None
 keystroke_scaler = None
 
-def init_models():
-    """Initialize and load ML models and their scalers"""
-    global mouse_model, keystroke_model, mouse_scaler, keystroke_scaler
+MODELS_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../models'))
+
+# Logical name -> file in MODELS_DIR
+_MODEL_PATHS = {
+    'mouse': 'svm_model.joblib',
+    'mouse_scaler': 'mouse_scaler.joblib',
+    'keystroke': 'xgboost_pipeline.joblib',
+    'keystroke_scaler': 'keystroke_scaler.joblib',
+}
+# Models init_models can load; each has '<kind>' and '<kind>_scaler' entries above
+MODEL_KINDS = ('mouse', 'keystroke')
+
+# Logical name -> absolute path, built once at import
+_MODEL_FILES = {name: os.path.join(MODELS_DIR, filename) for name, filename in _MODEL_PATHS.items()}
+
+# Scaler mean_/scale_ arrays written by extract_scalers.py; when present they
+# replace the pipeline introspection and the scaler pickles
+_SCALER_NPZ_FILES = {
+    'mouse_scaler': os.path.join(MODELS_DIR, 'mouse_scaler.npz'),
+    'keystroke_scaler': os.path.join(MODELS_DIR, 'keystroke_scaler.npz'),
+}
+
+# Folded mouse SVM weights written by export_weights.py: plain arrays,
+# read without running the pickle machine
+MOUSE_LINEAR_PATH = os.path.join(MODELS_DIR, 'svm_linear.npz')
+
+# Native XGBoost booster written by migrate_xgb.py; loaded with the
+# keystroke scaler in place of the pickled pipeline when present
+KEYSTROKE_BOOSTER_PATH = os.path.join(MODELS_DIR, 'keystroke.ubj')
+
+# Keystroke pipeline (scaler + classifier) as an ONNX graph written by
+# export_onnx.py; served with ONNX Runtime when present and installed
+KEYSTROKE_ONNX_PATH = os.path.join(MODELS_DIR, 'keystroke.onnx')
+
+# (weights, bias) of the mouse decision function when the mouse model is a
+# scaler + linear SVM pipeline; lets mouse_scores skip sklearn entirely.
+mouse_linear = None
+
+# (mean, 1/scale, classifier) when the keystroke model is a StandardScaler +
+# classifier pipeline; keystroke_scores then scales with two numpy ops
+# instead of StandardScaler.transform's validation and dispatch.
+keystroke_fused = None
+
+# (kinds, {path: (st_mtime_ns, st_size) or None}) of the files behind the
+# last successful init_models; a repeat call with nothing changed is a no-op
+_fingerprint = None
+
+# What a loaded model supports, worked out once after loading so scoring
+# code branches on these flags instead of probing the model per call.
+ModelCaps = namedtuple('ModelCaps', ['is_pipeline', 'is_svc', 'has_decision_function', 'has_predict_proba'])
+mouse_caps = None
+
+
+def _fold_linear_pipeline(model):
+    """
+    For a Pipeline of a StandardScaler followed by a linear-kernel SVM, folds
+    the scaler into the SVM weights so decision = X @ w + b on raw features.
+    Returns (w, b) as float32, or None for any other model.
+    """
+    steps = list(getattr(model, 'named_steps', {}).values())
+    if len(steps) != 2 or getattr(steps[-1], 'kernel', None) != 'linear':
+        return None
+    scaler, clf = steps
+    if not hasattr(scaler, 'scale_'):
+        return None
+    coef = np.asarray(clf.coef_.toarray() if hasattr(clf.coef_, 'toarray') else clf.coef_, dtype=np.float64).ravel()
+    scale = scaler.scale_ if scaler.scale_ is not None else np.ones_like(coef)
+    mean = scaler.mean_ if getattr(scaler, 'mean_', None) is not None else np.zeros_like(coef)
+    w = coef / scale
+    b = float(clf.intercept_[0]) - float(mean @ w)
+    return w.astype(np.float32), np.float32(b)
+
+
+def _scaler_arrays(scaler):
+    """Returns a fitted scaler's (mean_, 1 / scale_) as float32 arrays."""
+    return (np.asarray(scaler.mean_, dtype=np.float32),
+            np.asarray(1.0 / np.asarray(scaler.scale_, dtype=np.float64), dtype=np.float32))
+
+
+def _fuse_scaler_pipeline(model):
+    """
+    For a Pipeline of a centring StandardScaler followed by a classifier,
+    returns (mean, 1/scale, classifier) for keystroke_scores; None for any
+    other model.
+    """
+    if not isinstance(model, Pipeline) or len(model.steps) != 2:
+        return None
+    scaler, clf = model.steps[0][1], model.steps[1][1]
+    if (not isinstance(scaler, StandardScaler) or scaler.mean_ is None or scaler.scale_ is None
+            or not hasattr(clf, 'predict_proba')):
+        return None
+    return (*_scaler_arrays(scaler), clf)
+
+
+def _scale(X, mean, inv_scale):
+    """(X - mean) * inv_scale as a new float32 array."""
+    scaled = np.subtract(X, mean, dtype=np.float32)
+    scaled *= inv_scale
+    return scaled
+
+
+class BoosterPipeline:
+    """
+    Stand-in for the keystroke Pipeline (StandardScaler + XGBClassifier)
+    built from the scaler and a natively loaded binary:logistic Booster.
+    Provides the predict_proba/predict/n_features_in_ the app uses.
+    """
+    def __init__(self, scaler, booster):
+        self.booster = booster
+        self.n_features_in_ = booster.num_features()
+        self._mean, self._inv_scale = _scaler_arrays(scaler)
+
+    def positive_proba(self, X):
+        """Class-1 probability per row; what binary:logistic emits, with no (n, 2) array built."""
+        return self.booster.inplace_predict(_scale(X, self._mean, self._inv_scale))
+
+    def predict_proba(self, X):
+        proba = self.positive_proba(X)
+        return np.column_stack((1.0 - proba, proba))
+
+    def predict(self, X):
+        return (self.positive_proba(X) >= 0.5).astype(np.int64)
+
+
+def _load_booster_pipeline(path, scaler):
+    """Returns a BoosterPipeline for the booster file, or None if it cannot be used."""
+    if scaler is None:
+        logger.warning("%s found but no keystroke scaler; using the pickled pipeline", os.path.basename(path))
+        return None
+    try:
+        import xgboost as xgb
+        booster = xgb.Booster()
+        booster.load_model(path)
+    except Exception as e:
+        logger.warning("Could not load %s (%s); falling back", os.path.basename(path), e)
+        return None
+    logger.info("Loaded keystroke booster from %s", os.path.basename(path))
+    return BoosterPipeline(scaler, booster)
+
+
+class OnnxPipeline:
+    """
+    Stand-in for the keystroke Pipeline served by ONNX Runtime from the
+    graph written by export_onnx.py (scaler and classifier in one graph,
+    probabilities as a float32 (n, 2) tensor). Provides the
+    predict_proba/predict/n_features_in_ the app uses.
+    """
+    def __init__(self, session):
+        self.session = session
+        model_input = session.get_inputs()[0]
+        self._input_name = model_input.name
+        self.n_features_in_ = model_input.shape[1]
+        # Outputs are (label, probabilities)
+        self._proba_name = session.get_outputs()[1].name
+
+    def predict_proba(self, X):
+        return self.session.run([self._proba_name], {self._input_name: np.asarray(X, dtype=np.float32)})[0]
+
+    def positive_proba(self, X):
+        """Class-1 probability per row, as a view of the output tensor."""
+        return self.predict_proba(X)[:, 1]
+
+    def predict(self, X):
+        return (self.positive_proba(X) >= 0.5).astype(np.int64)
+
+
+def _load_onnx_pipeline(path):
+    """Returns an OnnxPipeline for the graph file, or None if it cannot be used."""
+    try:
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        # No intra/inter-op thread pools: the session is created in the
+        # gunicorn master and pool threads would not exist in the forked
+        # workers. Batches are small; the batcher thread runs them.
+        options.intra_op_num_threads = 1
+        options.inter_op_num_threads = 1
+        session = ort.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+    except Exception as e:
+        logger.warning("Could not load %s (%s); falling back", os.path.basename(path), e)
+        return None
+    logger.info("Loaded keystroke ONNX graph from %s", os.path.basename(path))
+    return OnnxPipeline(session)
+
+
+def pickle_protocol(path):
+    """Returns the pickle protocol a model file was written with (from its PROTO header), or None."""
+    with open(path, 'rb') as f:
+        header = f.read(2)
+    return header[1] if len(header) == 2 and header[0] == 0x80 else None
+
+
+def _load_mmap(path):
+    """
+    joblib.load with the model's numpy arrays memory-mapped read-only from
+    the file, so gunicorn workers share the page cache instead of each
+    holding a heap copy. Falls back to a regular load if mapping fails.
+    """
+    try:
+        return joblib.load(path, mmap_mode='r')
+    except FileNotFoundError:
+        raise
+    except (ValueError, OSError) as e:
+        logger.warning("Could not memory-map %s (%s), loading normally", os.path.basename(path), e)
+        return joblib.load(path)
+
+
+def _prefetch(paths):
+    """
+    Asks the kernel to start reading paths into the page cache
+    (POSIX_FADV_WILLNEED) so the loads that follow find them there.
+    Missing files are skipped; a no-op where posix_fadvise is unavailable.
+    """
+    if not hasattr(os, 'posix_fadvise'):
+        return
+    for path in paths:
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except FileNotFoundError:
+            continue
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+
+def _load_checked(path):
+    """_load_mmap, warning first if the file predates pickle protocol 5."""
+    protocol = pickle_protocol(path)
+    if protocol is not None and protocol < 5:
+        logger.warning("%s uses pickle protocol %d; run upgrade_pickle_protocol.py "
+                       "to rewrite it with protocol 5", os.path.basename(path), protocol)
+    return _load_mmap(path)
+
+
+def _load_concurrently(paths):
+    """
+    joblib.loads every file in paths on a thread pool. BLAS/OpenMP pools
+    are capped at one thread meanwhile, so the loads do not compete with
+    one pool thread per core being spun up; the limits are restored after.
+    
+    Returns:
+        Dict of path -> loaded object; files that are missing or fail to
+        load are left out (and reported), so one bad file does not stop
+        the others.
+    """
+    loaded = {}
+    if not paths:
+        # e.g. a keystroke-only load served from keystroke.onnx / .ubj
+        return loaded
+    with threadpool_limits(limits=1), ThreadPoolExecutor(max_workers=len(paths)) as pool:
+        futures = {path: pool.submit(_load_checked, path) for path in paths}
+        for path, future in futures.items():
+            try:
+                loaded[path] = future.result()
+            except FileNotFoundError:
+                logger.debug("%s not found", os.path.basename(path))
+            except Exception as e:
+                logger.error("Failed to load %s: %s", os.path.basename(path), e)
+    return loaded
+
+
+def _pack_svm_arrays(model):
+    """
+    Rebinds the arrays libsvm reads on every predict of an SVC (or a
+    Pipeline ending in one) to C-contiguous float64, its native layout, so
+    no per-call conversion copy is made. libsvm only computes in float64,
+    so float32 copies would be converted back on every call.
+    """
+    clf = list(model.named_steps.values())[-1] if hasattr(model, 'named_steps') else model
+    if not hasattr(clf, 'support_vectors_'):
+        return
+    for attr in ('support_vectors_', '_dual_coef_', 'dual_coef_', '_intercept_', 'intercept_'):
+        value = getattr(clf, attr, None)
+        if isinstance(value, np.ndarray):
+            setattr(clf, attr, np.ascontiguousarray(value, dtype=np.float64))
+
+
+def _load_linear_weights(path, model):
+    """
+    Reads (w, b) saved by export_weights.py, or None if the file is missing
+    or does not match the model's feature count.
+    """
+    try:
+        weights = np.load(path, allow_pickle=False)
+    except FileNotFoundError:
+        return None
+    with weights:
+        w = np.ascontiguousarray(weights['w'], dtype=np.float32)
+        b = np.float32(weights['b'])
+    if w.shape != (getattr(model, 'n_features_in_', w.shape[0]),):
+        logger.warning("%s does not match the mouse model, ignoring it", os.path.basename(path))
+        return None
+    logger.info("Loaded mouse decision weights from %s", os.path.basename(path))
+    return w, b
+
+
+def _load_scaler_npz(path):
+    """
+    Reads mean/scale saved by extract_scalers.py as an object with the
+    StandardScaler mean_/scale_ attributes, or None if the file is missing.
+    """
+    try:
+        arrays = np.load(path, allow_pickle=False)
+    except FileNotFoundError:
+        return None
+    with arrays:
+        return SimpleNamespace(mean_=arrays['mean'], scale_=arrays['scale'])
+
+
+def _model_caps(model):
+    """Returns the ModelCaps of a loaded model."""
+    is_pipeline = isinstance(model, Pipeline)
+    final = model.steps[-1][1] if is_pipeline else model
+    return ModelCaps(is_pipeline=is_pipeline,
+                     is_svc=isinstance(final, SVC),
+                     has_decision_function=hasattr(model, 'decision_function'),
+                     has_predict_proba=hasattr(model, 'predict_proba'))
+
+
+def _describe_model(label, model, caps, scaler):
+    """Logs a loaded model's structure at DEBUG level."""
+    logger.debug("[%s] type: %s, predict_proba: %s, decision_function: %s",
+                 label, type(model).__name__, caps.has_predict_proba, caps.has_decision_function)
+    if caps.is_pipeline:
+        logger.debug("[%s] pipeline steps: %s", label, list(model.named_steps.keys()))
+    if scaler is not None:
+        logger.debug("[%s] scaler mean: %s, scale: %s", label, scaler.mean_, scaler.scale_)
+
+
+def _pipeline_scaler(model):
+    """Returns the fitted scaler step of a Pipeline model, or None."""
+    steps = getattr(model, 'named_steps', {})
+    for step_name in ['scaler', 'standardscaler', 'preprocessing']:
+        if step_name in steps:
+            extracted_scaler = steps[step_name]
+            if hasattr(extracted_scaler, 'mean_') and hasattr(extracted_scaler, 'scale_'):
+                return extracted_scaler
+    return None
+
+
+def _file_fingerprint(paths):
+    """Returns {path: (st_mtime_ns, st_size)} for paths, with None for missing files."""
+    fingerprint = {}
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            fingerprint[path] = None
+        else:
+            fingerprint[path] = (st.st_mtime_ns, st.st_size)
+    return fingerprint
+
+
+def init_models(which=MODEL_KINDS):
+    """
+    Initialize and load ML models and their scalers
     
-    base_path = os.path.dirname(os.path.abspath(__file__))
-    models_dir = os.path.join(base_path, '../models')
+    Args:
+        which: the models to load, any of MODEL_KINDS; each comes with its
+            scaler. Scripts that need one model skip reading the other.
+    """
+    global mouse_model, keystroke_model, mouse_scaler, keystroke_scaler, mouse_linear, mouse_caps, keystroke_fused
+    global _fingerprint
     
-    print("\n" + "="*60)
-    print("LOADING ML MODELS AND SCALERS")
-    print("="*60)
-    print(f"Base path: {base_path}")
-    print(f"Models directory: {models_dir}")
-    print(f"Models dir exists: {os.path.exists(models_dir)}")
+    unknown = set(which) - set(MODEL_KINDS)
+    if unknown:
+        raise ValueError(f"Unknown model kinds: {sorted(unknown)}")
+    load_mouse = 'mouse' in which
+    load_keystroke = 'keystroke' in which
     
-    if os.path.exists(models_dir):
-        print(f"Files in models dir: {os.listdir(models_dir)}")
+    logger.info("Loading ML models and scalers (%s) from %s", ", ".join(which), MODELS_DIR)
     
     try:
+        mouse_model_path = _MODEL_FILES['mouse']
+        mouse_scaler_path = _MODEL_FILES['mouse_scaler']
+        keystroke_model_path = _MODEL_FILES['keystroke']
+        keystroke_scaler_path = _MODEL_FILES['keystroke_scaler']
+        
+        # Start readahead of every candidate file before the first blocking read
+        candidates = []
+        if load_mouse:
+            candidates += [mouse_model_path, mouse_scaler_path, _SCALER_NPZ_FILES['mouse_scaler'], MOUSE_LINEAR_PATH]
+        if load_keystroke:
+            candidates += [keystroke_model_path, keystroke_scaler_path,
+                           _SCALER_NPZ_FILES['keystroke_scaler'], KEYSTROKE_BOOSTER_PATH, KEYSTROKE_ONNX_PATH]
+        
+        # Reloaders call this again on every restart; skip the work if no file changed
+        fingerprint = (tuple(sorted(set(which))), _file_fingerprint(candidates))
+        if fingerprint == _fingerprint:
+            logger.info("Model files unchanged since the last load, keeping the loaded models")
+            return
+        
+        _prefetch(candidates)
+        
+        # Listing the directory can be slow on network mounts; only on request
+        if os.environ.get('PROCTORING_DEBUG'):
+            logger.debug("Files in models dir: %s", sorted(os.listdir(MODELS_DIR)))
+        
+        # The files are independent, so read and unpickle them concurrently
+        # (joblib.load spends most of its time in I/O and numpy, off the GIL)
+        # With an ONNX or native booster export the keystroke pipeline pickle is
+        # not needed, and with exported scaler arrays neither are the scaler pickles
+        paths = []
+        if load_mouse:
+            mouse_scaler = _load_scaler_npz(_SCALER_NPZ_FILES['mouse_scaler'])
+            paths.append(mouse_model_path)
+            if mouse_scaler is None:
+                paths.append(mouse_scaler_path)
+        if load_keystroke:
+            use_onnx = os.path.exists(KEYSTROKE_ONNX_PATH)
+            use_booster = os.path.exists(KEYSTROKE_BOOSTER_PATH)
+            keystroke_scaler = _load_scaler_npz(_SCALER_NPZ_FILES['keystroke_scaler'])
+            if keystroke_scaler is None:
+                paths.append(keystroke_scaler_path)
+            if not (use_onnx or use_booster):
+                paths.append(keystroke_model_path)
+        loaded = _load_concurrently(paths)
+        
         # =====================================================================
         # MOUSE MODEL + SCALER
         # =====================================================================
-        mouse_model_path = os.path.join(models_dir, 'svm_model.joblib')
-        mouse_scaler_path = os.path.join(models_dir, 'mouse_scaler.joblib')
-        
-        print(f"\n[MOUSE MODEL]")
-        print(f"  Path: {mouse_model_path}")
-        print(f"  Exists: {os.path.exists(mouse_model_path)}")
-        
-        if os.path.exists(mouse_model_path):
-            mouse_model = joblib.load(mouse_model_path)
-            print(f"  ✓ Model loaded")
-            print(f"  Type: {type(mouse_model)}")
-            print(f"  Has predict_proba: {hasattr(mouse_model, 'predict_proba')}")
-            print(f"  Has decision_function: {hasattr(mouse_model, 'decision_function')}")
+        if load_mouse:
+            mouse_model = loaded.get(mouse_model_path)
+            if mouse_model is None:
+                logger.error("[MOUSE MODEL] %s not found or failed to load", mouse_model_path)
+            elif mouse_scaler is None:
+                # Otherwise prefer the scaler fitted inside the pipeline
+                mouse_scaler = _pipeline_scaler(mouse_model)
             
-            # Check if model is a Pipeline with embedded scaler
-            if hasattr(mouse_model, 'named_steps'):
-                print(f"  ✓ Model is a Pipeline")
-                print(f"  Pipeline steps: {list(mouse_model.named_steps.keys())}")
-                
-                # Try to extract scaler from pipeline
-                for step_name in ['scaler', 'standardscaler', 'preprocessing']:
-                    if step_name in mouse_model.named_steps:
-                        extracted_scaler = mouse_model.named_steps[step_name]
-                        if hasattr(extracted_scaler, 'mean_') and hasattr(extracted_scaler, 'scale_'):
-                            mouse_scaler = extracted_scaler
-                            print(f"  ✓ Extracted scaler from pipeline step '{step_name}'")
-                            print(f"  Scaler mean: {mouse_scaler.mean_}")
-                            print(f"  Scaler scale: {mouse_scaler.scale_}")
-                            break
-        else:
-            print(f"  ❌ Model file not found!")
-        
-        # Try to load separate scaler file if not found in pipeline
-        if mouse_scaler is None and os.path.exists(mouse_scaler_path):
-            mouse_scaler = joblib.load(mouse_scaler_path)
-            print(f"  ✓ Loaded separate scaler file")
-            print(f"  Scaler mean: {mouse_scaler.mean_}")
-            print(f"  Scaler scale: {mouse_scaler.scale_}")
-        elif mouse_scaler is None:
-            print(f"  ⚠️  No scaler found (will use raw features)")
+            # Fall back to the separate scaler file if not found in pipeline
+            if mouse_scaler is None:
+                mouse_scaler = loaded.get(mouse_scaler_path)
+            if mouse_scaler is None:
+                logger.warning("[MOUSE MODEL] No scaler found (will use raw features)")
+            if mouse_model is not None and logger.isEnabledFor(logging.DEBUG):
+                _describe_model("MOUSE MODEL", mouse_model, _model_caps(mouse_model), mouse_scaler)
         
         # =====================================================================
         # KEYSTROKE MODEL + SCALER
         # =====================================================================
-        keystroke_model_path = os.path.join(models_dir, 'xgboost_pipeline.joblib')
-        keystroke_scaler_path = os.path.join(models_dir, 'keystroke_scaler.joblib')
-        
-        print(f"\n[KEYSTROKE MODEL]")
-        print(f"  Path: {keystroke_model_path}")
-        print(f"  Exists: {os.path.exists(keystroke_model_path)}")
-        
-        if os.path.exists(keystroke_model_path):
-            keystroke_model = joblib.load(keystroke_model_path)
-            print(f"  ✓ Model loaded")
-            print(f"  Type: {type(keystroke_model)}")
-            print(f"  Has predict_proba: {hasattr(keystroke_model, 'predict_proba')}")
-            print(f"  Has predict: {hasattr(keystroke_model, 'predict')}")
+        if load_keystroke:
+            # Preference: ONNX graph, native booster, pickled pipeline
+            keystroke_model = loaded.get(keystroke_model_path)
+            if keystroke_model is None and use_onnx:
+                keystroke_model = _load_onnx_pipeline(KEYSTROKE_ONNX_PATH)
+            if keystroke_model is None and use_booster:
+                keystroke_model = _load_booster_pipeline(KEYSTROKE_BOOSTER_PATH,
+                                                         keystroke_scaler or loaded.get(keystroke_scaler_path))
+            if keystroke_model is None and (use_onnx or use_booster):
+                keystroke_model = _load_concurrently([keystroke_model_path]).get(keystroke_model_path)
+            if keystroke_model is None:
+                logger.error("[KEYSTROKE MODEL] %s not found or failed to load", keystroke_model_path)
+            elif keystroke_scaler is None:
+                keystroke_scaler = _pipeline_scaler(keystroke_model)
             
-            # Check if model is a Pipeline with embedded scaler
-            if hasattr(keystroke_model, 'named_steps'):
-                print(f"  ✓ Model is a Pipeline")
-                print(f"  Pipeline steps: {list(keystroke_model.named_steps.keys())}")
-                
-                # Try to extract scaler from pipeline
-                for step_name in ['scaler', 'standardscaler', 'preprocessing']:
-                    if step_name in keystroke_model.named_steps:
-                        extracted_scaler = keystroke_model.named_steps[step_name]
-                        if hasattr(extracted_scaler, 'mean_') and hasattr(extracted_scaler, 'scale_'):
-                            keystroke_scaler = extracted_scaler
-                            print(f"  ✓ Extracted scaler from pipeline step '{step_name}'")
-                            print(f"  Scaler mean (first 3): {keystroke_scaler.mean_[:3]}")
-                            print(f"  Scaler scale (first 3): {keystroke_scaler.scale_[:3]}")
-                            break
-        else:
-            print(f"  ❌ Model file not found!")
-        
-        # Try to load separate scaler file if not found in pipeline
-        if keystroke_scaler is None and os.path.exists(keystroke_scaler_path):
-            keystroke_scaler = joblib.load(keystroke_scaler_path)
-            print(f"  ✓ Loaded separate scaler file")
-            print(f"  Scaler mean (first 3): {keystroke_scaler.mean_[:3]}")
-            print(f"  Scaler scale (first 3): {keystroke_scaler.scale_[:3]}")
-        elif keystroke_scaler is None:
-            print(f"  ⚠️  No scaler found (will use raw features)")
+            if keystroke_scaler is None:
+                keystroke_scaler = loaded.get(keystroke_scaler_path)
+            if keystroke_scaler is None:
+                logger.warning("[KEYSTROKE MODEL] No scaler found (will use raw features)")
+            if keystroke_model is not None and logger.isEnabledFor(logging.DEBUG):
+                _describe_model("KEYSTROKE MODEL", keystroke_model, _model_caps(keystroke_model), keystroke_scaler)
         
         # =====================================================================
         # VERIFICATION
         # =====================================================================
-        if mouse_model is None or keystroke_model is None:
-            print("\n❌ ERROR: One or both models failed to load!")
-            print(f"   Mouse model: {'✓' if mouse_model else '✗'}")
-            print(f"   Keystroke model: {'✓' if keystroke_model else '✗'}")
+        if (load_mouse and mouse_model is None) or (load_keystroke and keystroke_model is None):
+            logger.error("One or both models failed to load (mouse: %s, keystroke: %s)",
+                         mouse_model is not None, keystroke_model is not None)
             raise Exception("Model loading failed")
+
+        if load_mouse:
+            mouse_caps = _model_caps(mouse_model)
+            mouse_linear = _load_linear_weights(MOUSE_LINEAR_PATH, mouse_model) or _fold_linear_pipeline(mouse_model)
+            if mouse_linear is None:
+                # Non-linear kernel: mouse_scores goes through libsvm
+                _pack_svm_arrays(mouse_model)
+        if load_keystroke:
+            keystroke_fused = _fuse_scaler_pipeline(keystroke_model)
+        warm_up_models()
+        _fingerprint = fingerprint
         
-        print("\n" + "="*60)
-        print("✓✓✓ ALL MODELS LOADED SUCCESSFULLY ✓✓✓")
-        if keystroke_scaler or mouse_scaler:
-            print("✓✓✓ SCALERS LOADED ✓✓✓")
-            print(f"    Keystroke scaler: {'✓' if keystroke_scaler else '✗ (will use raw features)'}")
-            print(f"    Mouse scaler: {'✓' if mouse_scaler else '✗ (will use raw features)'}")
-        else:
-            print("⚠️  NO SCALERS FOUND - USING RAW FEATURES")
-        print("="*60 + "\n")
+        logger.info("Models loaded (keystroke scaler: %s, mouse scaler: %s)",
+                    keystroke_scaler is not None, mouse_scaler is not None)
         
-    except Exception as e:
-        print(f"\n❌❌❌ ERROR LOADING MODELS: {e} ❌❌❌")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Error loading models")
         raise
 
+def warm_up_models():
+    """
+    Scores one all-zero row through each model so lazy sklearn/xgboost
+    setup and BLAS thread start-up happen here instead of on the first
+    /analyze_behavior request of each worker. init_models runs it once;
+    gunicorn's post_fork runs it again in each worker, since BLAS/OpenMP
+    thread pools do not survive fork.
+    """
+    for name, model, score_fn in (('mouse', mouse_model, mouse_scores),
+                                  ('keystroke', keystroke_model, keystroke_scores)):
+        n_features = getattr(model, 'n_features_in_', None)
+        if n_features is None:
+            continue
+        try:
+            score_fn(np.zeros((1, n_features), dtype=np.float32))
+            logger.debug("Warmed up %s model", name)
+        except Exception as e:
+            logger.warning("Warm-up of %s model failed: %s", name, e)
+
+
+# Rows come from our own feature extractors, so sklearn's per-call NaN/inf
+# scan is skipped. sklearn's config is thread-local: it is set around each
+# call because scoring runs on batcher and request threads, not the thread
+# that ran init_models.
+def keystroke_scores(X):
+    """Anomaly probability (class 1) for each row of X."""
+    if isinstance(keystroke_model, (BoosterPipeline, OnnxPipeline)) and keystroke_fused is None:
+        return keystroke_model.positive_proba(X)
+    with sklearn.config_context(assume_finite=True):
+        if keystroke_fused is not None:
+            mean, inv_scale, clf = keystroke_fused
+            return clf.predict_proba(_scale(X, mean, inv_scale))[:, 1]
+        return keystroke_model.predict_proba(X)[:, 1]
+
+
+def mouse_scores(X):
+    """Anomaly score for each row of X (sigmoid of the SVM decision when available)."""
+    if mouse_linear is not None:
+        w, b = mouse_linear
+        decision = X @ w + b
+    else:
+        # The pickled pipeline was fitted on a DataFrame; X is a plain
+        # ndarray in MOUSE_FEATURE_NAMES order, so its warning is noise
+        with warnings.catch_warnings(), sklearn.config_context(assume_finite=True):
+            warnings.filterwarnings("ignore", message="X does not have valid feature names")
+            if not mouse_caps.has_decision_function:
+                return mouse_model.predict_proba(X)[:, 1]
+            decision = mouse_model.decision_function(X)
+    # Positive = anomaly, Negative = normal
+    return expit(decision)
+
+
+@functools.cache
+def _load(name):
+    """
+    Loads one model file by logical name on first use (then cached), for
+    processes that never ran init_models (scripts, tests). Returns None if
+    the file does not exist.
+    """
+    try:
+        return _load_mmap(_MODEL_FILES[name])
+    except FileNotFoundError:
+        return None
+
+
 def get_mouse_model():
-    """Get the loaded mouse model"""
-    if mouse_model is None:
+    """Get the mouse model (loaded on first use if init_models() was not called)"""
+    model = mouse_model if mouse_model is not None else _load('mouse')
+    if model is None:
         raise Exception("Mouse model not initialized. Call init_models() first.")
-    return mouse_model
+    return model
 
 def get_keystroke_model():
-    """Get the loaded keystroke model"""
-    if keystroke_model is None:
+    """Get the keystroke model (loaded on first use if init_models() was not called)"""
+    model = keystroke_model if keystroke_model is not None else _load('keystroke')
+    if model is None:
         raise Exception("Keystroke model not initialized. Call init_models() first.")
-    return keystroke_model
+    return model
+
+def get_mouse_caps():
+    """Get the ModelCaps of the mouse model (worked out on first use if init_models() was not called)"""
+    global mouse_caps
+    if mouse_caps is None:
+        mouse_caps = _model_caps(get_mouse_model())
+    return mouse_caps
 
 def get_mouse_scaler():
-    """Get the loaded mouse scaler (may be None if not found)"""
-    return mouse_scaler
+    """Get the mouse scaler (may be None if not found)"""
+    return mouse_scaler if mouse_scaler is not None else _load('mouse_scaler')
 
 def get_keystroke_scaler():
-    """Get the loaded keystroke scaler (may be None if not found)"""
-    return keystroke_scaler
\ No newline at end of file
+    """Get the keystroke scaler (may be None if not found)"""
+    return keystroke_scaler if keystroke_scaler is not None else _load('keystroke_scaler')
\ No newline at end of file
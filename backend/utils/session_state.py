@@ -1,3 +1,88 @@
-# Stores raw, unnormalized feature vectors for each session.
-SESSION_FEATURE_HISTORY = {}
-ROLLING_WINDOW_SIZE = 5  # For RT models (e.g., 50 seconds)
+import os
+import threading
+import time
+import numpy as np
+from features.keystroke_feature_extractor import KEYSTROKE_FEATURE_NAMES
+from features.mouse_feature_extractor import MOUSE_FEATURE_NAMES
+
+# Last scored feature rows and scores for each session, for the delta gate.
+# {session_id: SessionBuffer}
+SESSION_SCORE_STATE = {}
+SESSION_TTL = 4 * 60 * 60  # Seconds without activity before a session's state is dropped
+# Largest per-feature change between consecutive windows that still counts
+# as "unchanged", letting the last model scores be reused
+DELTA_GATE_EPS = float(os.environ.get('DELTA_GATE_EPS', 1e-3))
+
+_registry_lock = threading.Lock()
+_last_eviction = 0.0
+
+# Delta-gate hit/miss counters for this process
+GATE_STATS = {'hits': 0, 'misses': 0}
+_gate_stats_lock = threading.Lock()
+
+
+class SessionBuffer:
+    """
+    Per-session gate state. Reads and writes hold the buffer's own lock, so
+    concurrent requests for different sessions never wait on each other.
+    """
+    def __init__(self):
+        self.last_seen = time.monotonic()
+        self.lock = threading.Lock()
+        # Feature rows the last model scores were computed from
+        self.scored_k = np.empty(len(KEYSTROKE_FEATURE_NAMES), dtype=np.float32)
+        self.scored_m = np.empty(len(MOUSE_FEATURE_NAMES), dtype=np.float32)
+        self.last_scores = None
+
+
+def _get_buffer(session_id, create=False):
+    """Looks up (optionally creating) a session's buffer under the registry lock."""
+    now = time.monotonic()
+    with _registry_lock:
+        _evict_expired(now)
+        buf = SESSION_SCORE_STATE.get(session_id)
+        if buf is None and create:
+            buf = SessionBuffer()
+            SESSION_SCORE_STATE[session_id] = buf
+        if buf is not None and create:
+            buf.last_seen = now
+        return buf
+
+
+def _evict_expired(now):
+    """Drops the state of sessions idle for longer than SESSION_TTL (at most once a minute)."""
+    global _last_eviction
+    if now - _last_eviction < 60:
+        return
+    _last_eviction = now
+    expired = [sid for sid, buf in SESSION_SCORE_STATE.items() if now - buf.last_seen > SESSION_TTL]
+    for sid in expired:
+        del SESSION_SCORE_STATE[sid]
+
+
+def get_gated_scores(session_id, k_row, m_row, eps=DELTA_GATE_EPS):
+    """
+    Returns the (keystroke, mouse) scores last computed for a session if
+    neither feature row has moved by more than eps in any feature since,
+    else None (the rows must be scored again).
+    """
+    buf = _get_buffer(session_id)
+    scores = None
+    if buf is not None:
+        with buf.lock:
+            if (buf.last_scores is not None
+                    and np.max(np.abs(k_row - buf.scored_k)) <= eps
+                    and np.max(np.abs(m_row - buf.scored_m)) <= eps):
+                scores = buf.last_scores
+    with _gate_stats_lock:
+        GATE_STATS['hits' if scores is not None else 'misses'] += 1
+    return scores
+
+
+def remember_scores(session_id, k_row, m_row, k_score, m_score):
+    """Records the scores computed for a session's feature rows, for get_gated_scores."""
+    buf = _get_buffer(session_id, create=True)
+    with buf.lock:
+        np.copyto(buf.scored_k, k_row)
+        np.copyto(buf.scored_m, m_row)
+        buf.last_scores = (k_score, m_score)